@@ -0,0 +1,92 @@
+import cv2
+import queue
+import sys
+import threading
+import numpy as np
+from typing import Optional, Union
+
+def _preferred_backend() -> int:
+    """Native capture backend for this platform (autodetection often picks a slower one)"""
+    if sys.platform.startswith("linux"):
+        return cv2.CAP_V4L2
+    if sys.platform == "win32":
+        return cv2.CAP_MSMF
+    if sys.platform == "darwin":
+        return cv2.CAP_AVFOUNDATION
+    return cv2.CAP_ANY
+
+def open_camera(camera_index: Union[int, str] = 0, width: int = None, height: int = None,
+                fps: float = None) -> cv2.VideoCapture:
+    """Open a camera with the native backend, MJPG frames and a 1-frame driver buffer
+
+    camera_index may also be a GStreamer pipeline string (e.g. one using nvv4l2decoder for
+    hardware JPEG decode on Jetson); it is opened with CAP_GSTREAMER and used as is.
+    """
+    if isinstance(camera_index, str) and "!" in camera_index:
+        return cv2.VideoCapture(camera_index, cv2.CAP_GSTREAMER)
+    cap = cv2.VideoCapture(camera_index, _preferred_backend())
+    if not cap.isOpened():
+        cap = cv2.VideoCapture(camera_index)
+    # MJPG needs far less USB bandwidth than raw YUYV, so webcams deliver higher frame rates
+    cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*'MJPG'))
+    # Don't let stale frames queue up in the driver
+    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+    # Pin the mode so the driver doesn't pick a slow default
+    if width and height:
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+    if fps:
+        cap.set(cv2.CAP_PROP_FPS, fps)
+    return cap
+
+def put_drop_oldest(q: queue.Queue, item):
+    """Put item on a bounded queue, discarding the oldest entry when it is full (realtime streams)"""
+    while True:
+        try:
+            q.put_nowait(item)
+            return
+        except queue.Full:
+            try:
+                q.get_nowait()
+            except queue.Empty:
+                pass
+
+class FrameGrabber:
+    """Reads camera frames on a background thread, keeping only the most recent one"""
+
+    def __init__(self, cap: cv2.VideoCapture):
+        self.cap = cap
+        self.failed = False
+        self._frames = queue.Queue(maxsize=1)
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._capture_loop, daemon=True)
+
+    def start(self) -> "FrameGrabber":
+        """Start the capture thread"""
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop the capture thread (the caller still owns and releases the VideoCapture)"""
+        self._stop_event.set()
+        self._thread.join()
+
+    def read(self, timeout: float = 0.5) -> Optional[np.ndarray]:
+        """Return the newest frame, or None on timeout or once the camera has failed"""
+        try:
+            return self._frames.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def _capture_loop(self):
+        while not self._stop_event.is_set():
+            ret, frame = self.cap.read()
+            if not ret:
+                self.failed = True
+                self._put_latest(None)
+                break
+            self._put_latest(frame)
+
+    def _put_latest(self, frame: Optional[np.ndarray]):
+        """Replace any frame the consumer has not picked up yet"""
+        put_drop_oldest(self._frames, frame)
@@ -2,7 +2,7 @@ import cv2
 import threading
 import time
 import os
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Iterator
 from object_detector import ObjectDetector
 from visual_memory import VisualMemory
 from ollama_client import OllamaClient
@@ -12,8 +12,8 @@ class EnhancedAIHomeAssistant:
     """Enhanced AI Home Assistant with custom zone support"""
     
     def __init__(self, model_path: str = "yolo11n.pt"):
-        self.object_detector = ObjectDetector(model_path)
         self.visual_memory = VisualMemory()
+        self.object_detector = ObjectDetector(model_path, visual_memory=self.visual_memory)
         self.ollama_client = OllamaClient()
         self.zone_tool = ZoneDefinitionTool()
         self.is_running = False
@@ -42,6 +42,7 @@ class EnhancedAIHomeAssistant:
             print("   Please make sure Ollama is running with: ollama serve")
         else:
             print("✅ Ollama service is available")
+            self.ollama_client.ensure_model()
         
         # Load and display zones
         zones = self.visual_memory.load_custom_zones(self.zones_file)
@@ -68,34 +69,32 @@ class EnhancedAIHomeAssistant:
     
     def ask_question(self, question: str) -> str:
         """Ask a question about object locations"""
+        return "".join(self.ask_question_stream(question))
+    
+    def ask_question_stream(self, question: str) -> Iterator[str]:
+        """Ask a question about object locations, yielding the answer as it is generated"""
         if not self.is_running:
-            return "Home assistant is not running. Please start it first."
+            yield "Home assistant is not running. Please start it first."
+            return
         
-        # Get recent detections for context
-        recent_detections = self.visual_memory.get_recent_detections(hours=24, limit=20)
+        # Get the latest sighting of each recently detected object for context
+        recent_detections = self.visual_memory.get_object_context(hours=24, limit_objects=20)
         
         if not recent_detections:
-            return "I haven't detected any objects recently. Make sure the camera is working and objects are visible."
+            yield "I haven't detected any objects recently. Make sure the camera is working and objects are visible."
+            return
         
         # Use Ollama to answer the question
         if self.ollama_client.is_available():
-            return self.ollama_client.answer_object_question(question, recent_detections)
+            yield from self.ollama_client.answer_object_question_stream(question, recent_detections)
         else:
             # Fallback to simple text-based answers
-            return self._simple_answer(question, recent_detections)
+            yield self._simple_answer(question, recent_detections)
     
     def _simple_answer(self, question: str, detections: List[Dict]) -> str:
         """Simple fallback answer when Ollama is not available"""
-        question_lower = question.lower()
-        
         # Extract object name from question
-        detected_objects = self.visual_memory.get_all_objects()
-        mentioned_object = None
-        
-        for obj in detected_objects:
-            if obj.lower() in question_lower:
-                mentioned_object = obj
-                break
+        mentioned_object = self.visual_memory.find_mentioned_object(question)
         
         if mentioned_object:
             # Get history for the mentioned object
@@ -108,7 +107,7 @@ class EnhancedAIHomeAssistant:
                 return f"I don't have recent information about {mentioned_object}."
         else:
             # General information
-            recent_objects = list(set([d['object_name'] for d in detections]))
+            recent_objects = list(dict.fromkeys(d['object_name'] for d in detections))
             return f"I've recently detected these objects: {', '.join(recent_objects[:5])}. Ask me about any specific object!"
     
     def get_status(self) -> Dict[str, Any]:
@@ -199,8 +198,10 @@ def main():
                 elif user_input.lower() == 'zones':
                     assistant.redefine_zones()
                 elif user_input:
-                    answer = assistant.ask_question(user_input)
-                    print(f"🤖 Assistant: {answer}")
+                    print("🤖 Assistant: ", end="", flush=True)
+                    for chunk in assistant.ask_question_stream(user_input):
+                        print(chunk, end="", flush=True)
+                    print()
                     
             except KeyboardInterrupt:
                 break
@@ -0,0 +1,152 @@
+import cv2
+import json
+import numpy as np
+import os
+import re
+import torch
+from ultralytics import YOLO
+
+def _sibling_path(model_path: str, extension: str) -> str:
+    """Path of an exported model next to the .pt weights"""
+    return os.path.splitext(model_path)[0] + extension
+
+def _tensorrt_version() -> str:
+    try:
+        import tensorrt
+        return tensorrt.__version__
+    except ImportError:
+        return "unknown"
+
+def _engine_path(model_path: str, batch_size: int, imgsz: int, int8: bool) -> str:
+    """Engine file name keyed by everything a TensorRT engine is only valid for"""
+    # Engines are tied to the GPU model and TensorRT version they were built with
+    gpu = re.sub(r"[^A-Za-z0-9]+", "-", torch.cuda.get_device_name(0)).strip("-").lower()
+    precision = "int8" if int8 else "fp16"
+    return _sibling_path(model_path, f".{gpu}.trt{_tensorrt_version()}.{precision}.{imgsz}.b{batch_size}.engine")
+
+def _calibration_images(calib_data: str, limit: int = 100) -> list:
+    """Paths of up to limit images in the calibration folder"""
+    names = sorted(n for n in os.listdir(calib_data) if n.lower().endswith((".jpg", ".jpeg", ".png")))
+    return [os.path.join(calib_data, name) for name in names[:limit]]
+
+def _letterbox(image: np.ndarray, imgsz: int) -> np.ndarray:
+    """Resize keeping the aspect ratio and pad centred with gray, like Ultralytics' LetterBox"""
+    h, w = image.shape[:2]
+    scale = min(imgsz / h, imgsz / w)
+    new_w, new_h = int(round(w * scale)), int(round(h * scale))
+    if (new_w, new_h) != (w, h):
+        image = cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+    dw, dh = (imgsz - new_w) / 2, (imgsz - new_h) / 2
+    top, bottom = int(round(dh - 0.1)), int(round(dh + 0.1))
+    left, right = int(round(dw - 0.1)), int(round(dw + 0.1))
+    return cv2.copyMakeBorder(image, top, bottom, left, right, cv2.BORDER_CONSTANT, value=(114, 114, 114))
+
+class _ImageCalibrationReader:
+    """onnxruntime calibration data: letterboxed images from a folder, loaded one per get_next() call"""
+
+    def __init__(self, folder: str, input_name: str, imgsz: int, limit: int = 100):
+        self._paths = iter(_calibration_images(folder, limit))
+        self._input_name = input_name
+        self._imgsz = imgsz
+
+    def get_next(self):
+        for path in self._paths:
+            image = cv2.imread(path)
+            if image is None:
+                continue
+            canvas = _letterbox(image, self._imgsz)
+            tensor = canvas[:, :, ::-1].transpose(2, 0, 1)[None].astype(np.float32) / 255.0
+            return {self._input_name: tensor}
+        return None
+
+def _calibration_yaml(model_path: str, calib_data: str) -> str:
+    """Ultralytics dataset yaml over the calibration folder, as TensorRT INT8 export expects"""
+    yaml_path = _sibling_path(model_path, ".calib.yaml")
+    # JSON is valid YAML; only images are needed for calibration, labels may be missing
+    with open(yaml_path, "w", encoding="utf-8") as f:
+        json.dump({"path": os.path.abspath(calib_data), "train": ".", "val": ".",
+                   "names": list(YOLO(model_path).names.values())}, f)
+    return yaml_path
+
+def _quantized_onnx(model_path: str, imgsz: int, calib_data: str = None) -> str:
+    """Export the .pt to ONNX and quantize it to INT8 for CPU inference; returns the path or None"""
+    # Statically calibrated and dynamic models are cached separately, so adding calib_data later
+    # doesn't keep reusing the uncalibrated one
+    calibrated = bool(calib_data) and os.path.isdir(calib_data)
+    mode = "static" if calibrated else "dynamic"
+    int8_path = _sibling_path(model_path, f".int8.{mode}.{imgsz}.onnx")
+    if os.path.exists(int8_path):
+        return int8_path
+    try:
+        import onnxruntime
+        from onnxruntime import quantization
+    except ImportError:
+        print("⚠️  onnxruntime is not installed, using the PyTorch model on CPU")
+        return None
+    try:
+        print("⚙️  Exporting YOLO model to INT8 ONNX (one-time)...")
+        fp32_path = YOLO(model_path).export(format="onnx", dynamic=True, simplify=True, imgsz=imgsz, device="cpu")
+        if calibrated:
+            # Static quantization calibrated on representative camera frames
+            input_name = onnxruntime.InferenceSession(
+                fp32_path, providers=["CPUExecutionProvider"]).get_inputs()[0].name
+            quantization.quantize_static(fp32_path, int8_path,
+                                         _ImageCalibrationReader(calib_data, input_name, imgsz),
+                                         quant_format=quantization.QuantFormat.QDQ,
+                                         weight_type=quantization.QuantType.QInt8)
+        else:
+            quantization.quantize_dynamic(fp32_path, int8_path, weight_type=quantization.QuantType.QUInt8)
+        return int8_path
+    except Exception as e:
+        print(f"⚠️  INT8 ONNX export failed: {e}")
+        if os.path.exists(int8_path):
+            os.remove(int8_path)
+        return None
+
+def load_yolo_model(model_path: str = "yolo11n.pt", batch_size: int = 1, imgsz: int = 640,
+                    int8: bool = False, calib_data: str = None, cpu_int8: bool = False) -> YOLO:
+    """Load a YOLO model, preferring a cached TensorRT engine (or ONNX export) on CUDA machines
+
+    calib_data is a folder of representative camera frames (.jpg/.png) used for INT8 calibration.
+    int8=True builds an INT8 engine calibrated on calib_data; without calib_data it falls back to FP16.
+    cpu_int8=True runs an INT8-quantized ONNX model through ONNX Runtime on machines without
+    CUDA (statically calibrated on calib_data when given, dynamically quantized otherwise).
+    """
+    if not model_path.endswith(".pt"):
+        return YOLO(model_path)
+    if not torch.cuda.is_available():
+        int8_path = _quantized_onnx(model_path, imgsz, calib_data) if cpu_int8 else None
+        # Ultralytics runs .onnx files with ONNX Runtime and keeps its own letterbox and NMS
+        return YOLO(int8_path, task="detect") if int8_path else YOLO(model_path)
+    if int8 and not (calib_data and os.path.isdir(calib_data)):
+        print("⚠️  INT8 needs a folder of calibration frames (calib_data=...), using FP16 instead")
+        int8 = False
+
+    # TensorRT engine: fused FP16/INT8 kernels, exported once and reused on later runs
+    engine_path = _engine_path(model_path, batch_size, imgsz, int8)
+    if not os.path.exists(engine_path):
+        try:
+            print("⚙️  Exporting YOLO model to TensorRT (one-time, may take a few minutes)...")
+            precision = ({"int8": True, "data": _calibration_yaml(model_path, calib_data)}
+                         if int8 else {"half": True})
+            exported = YOLO(model_path).export(format="engine", dynamic=True, batch=batch_size,
+                                               imgsz=imgsz, device=0, **precision)
+            os.replace(exported, engine_path)
+        except Exception as e:
+            print(f"⚠️  TensorRT export failed: {e}")
+    if os.path.exists(engine_path):
+        return YOLO(engine_path, task="detect")
+
+    # ONNX Runtime fallback, Ultralytics runs it with the CUDA execution provider
+    onnx_path = _sibling_path(model_path, ".onnx")
+    if not os.path.exists(onnx_path):
+        try:
+            print("⚙️  Exporting YOLO model to ONNX...")
+            YOLO(model_path).export(format="onnx", half=True, dynamic=True,
+                                    batch=batch_size, imgsz=imgsz, device=0)
+        except Exception as e:
+            print(f"⚠️  ONNX export failed: {e}")
+    if os.path.exists(onnx_path):
+        return YOLO(onnx_path, task="detect")
+
+    return YOLO(model_path)
@@ -1,75 +1,135 @@
 import cv2
 import numpy as np
-from ultralytics import YOLO
+import torch
 import threading
 import time
+from collections import deque
+from dataclasses import dataclass
 from typing import List, Tuple, Dict, Any
 from visual_memory import VisualMemory
+from model_loader import load_yolo_model
+from camera import FrameGrabber
+
+@dataclass
+class Detections:
+    """Detections for one frame, stored as parallel arrays"""
+    bboxes: np.ndarray      # (N, 4) float32, (x, y, width, height)
+    confs: np.ndarray       # (N,) float32
+    class_ids: np.ndarray   # (N,) int
+    names: Dict[int, str]   # model class-name table, shared by all frames
+    
+    def __len__(self) -> int:
+        return len(self.confs)
+    
+    @property
+    def class_names(self) -> List[str]:
+        return [self.names[class_id] for class_id in self.class_ids.tolist()]
+    
+    @classmethod
+    def empty(cls, names: Dict[int, str]) -> "Detections":
+        return cls(np.empty((0, 4), dtype=np.float32), np.empty(0, dtype=np.float32),
+                   np.empty(0, dtype=int), names)
 
 class ObjectDetector:
     """Handles object detection using YOLO11n model"""
     
-    def __init__(self, model_path: str = "yolo11n.pt", confidence_threshold: float = 0.3):
-        self.model = YOLO(model_path)
+    def __init__(self, model_path: str = "yolo11n.pt", confidence_threshold: float = 0.3,
+                 batch_size: int = 4, visual_memory: VisualMemory = None):
         self.confidence_threshold = confidence_threshold
-        self.visual_memory = VisualMemory()
+        self.batch_size = max(1, batch_size)  # frames per inference call
+        self.model = load_yolo_model(model_path, batch_size=self.batch_size)
+        # Fixed predictor settings so Ultralytics doesn't re-derive them on every call
+        use_cuda = torch.cuda.is_available()
+        self._predict_kwargs = dict(imgsz=640, half=use_cuda, device=0 if use_cuda else 'cpu', verbose=False)
+        if isinstance(self.model.model, torch.nn.Module):
+            self.model.fuse()  # fold Conv+BN (exported engines are already fused)
+        # Warm up once so the first camera frame doesn't pay for predictor setup
+        self.model.predict(np.zeros((640, 640, 3), dtype=np.uint8), **self._predict_kwargs)
+        # Share the caller's memory so zone/object caches and the DB connection exist once
+        self.visual_memory = visual_memory if visual_memory is not None else VisualMemory()
         self.is_detecting = False
         self.detection_thread = None
+        self._stop_event = threading.Event()
+        self.show_video = True
+        self.display_every = 1
+        self._display_count = 0
+        self._display_buf = None  # reused by draw_detections(inplace=False)
+        # Static-scene gate: frames whose dHash is within static_hash_threshold bits of the
+        # last inferred frame reuse its detections (disable for benchmarking)
+        self.skip_static_frames = True
+        self.static_hash_threshold = 5
+        self.static_refresh_seconds = 5.0  # still re-run inference this often on a static scene
+        self._last_hash = None
+        self._last_detections = Detections.empty(self.model.names)
+        self._last_inference_time = 0.0
         
-    def detect_objects(self, frame: np.ndarray) -> List[Dict[str, Any]]:
+    def detect_objects(self, frame: np.ndarray) -> Detections:
         """Detect objects in a single frame"""
-        results = self.model(frame, conf=self.confidence_threshold)
-        detections = []
+        return self.detect_objects_batch([frame])[0]
+    
+    def detect_objects_batch(self, frames: List[np.ndarray]) -> List[Detections]:
+        """Detect objects in several frames with one model call, one Detections per frame"""
+        results = self.model.predict(frames, conf=self.confidence_threshold, **self._predict_kwargs)
+        batch_detections = []
         
+        # Ultralytics returns one Results object per input frame, in order
         for result in results:
             boxes = result.boxes
-            if boxes is not None:
-                for box in boxes:
-                    # Get bounding box coordinates
-                    x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
-                    confidence = box.conf[0].cpu().numpy()
-                    class_id = int(box.cls[0].cpu().numpy())
-                    class_name = self.model.names[class_id]
-                    
-                    # Convert to (x, y, width, height) format
-                    x, y, w, h = x1, y1, x2-x1, y2-y1
-                    
-                    detection = {
-                        'class_name': class_name,
-                        'confidence': float(confidence),
-                        'bbox': (x, y, w, h),
-                        'class_id': class_id
-                    }
-                    detections.append(detection)
+            if boxes is None or not len(boxes):
+                batch_detections.append(Detections.empty(self.model.names))
+                continue
+            
+            # One GPU->CPU transfer per tensor instead of three per box
+            bboxes = boxes.xyxy.cpu().numpy().astype(np.float32)
+            bboxes[:, 2:] -= bboxes[:, :2]  # (x1, y1, x2, y2) -> (x, y, width, height)
+            batch_detections.append(Detections(
+                bboxes=bboxes,
+                confs=boxes.conf.cpu().numpy().astype(np.float32),
+                class_ids=boxes.cls.cpu().numpy().astype(int),
+                names=self.model.names
+            ))
         
-        return detections
+        return batch_detections
     
-    def draw_detections(self, frame: np.ndarray, detections: List[Dict]) -> np.ndarray:
-        """Draw bounding boxes and labels on frame"""
-        frame_copy = frame.copy()
+    def draw_detections(self, frame: np.ndarray, detections: Detections, inplace: bool = True) -> np.ndarray:
+        """Draw bounding boxes and labels on frame (in place unless inplace=False)"""
+        if inplace:
+            frame_copy = frame
+        else:
+            # Reuse one display buffer instead of allocating a copy per frame
+            if self._display_buf is None or self._display_buf.shape != frame.shape:
+                self._display_buf = np.empty_like(frame)
+            np.copyto(self._display_buf, frame)
+            frame_copy = self._display_buf
         
-        for detection in detections:
-            x, y, w, h = detection['bbox']
-            class_name = detection['class_name']
-            confidence = detection['confidence']
-            
+        for (x, y, w, h), confidence, class_name in zip(detections.bboxes.astype(int).tolist(),
+                                                        detections.confs.tolist(),
+                                                        detections.class_names):
             # Draw bounding box
-            cv2.rectangle(frame_copy, (int(x), int(y)), 
-                         (int(x + w), int(y + h)), (0, 255, 0), 2)
+            cv2.rectangle(frame_copy, (x, y), (x + w, y + h), (0, 255, 0), 2)
             
             # Draw label
             label = f"{class_name}: {confidence:.2f}"
             label_size = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 2)[0]
-            cv2.rectangle(frame_copy, (int(x), int(y) - label_size[1] - 10),
-                         (int(x) + label_size[0], int(y)), (0, 255, 0), -1)
-            cv2.putText(frame_copy, label, (int(x), int(y) - 5),
+            cv2.rectangle(frame_copy, (x, y - label_size[1] - 10),
+                         (x + label_size[0], y), (0, 255, 0), -1)
+            cv2.putText(frame_copy, label, (x, y - 5),
                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0), 2)
         
         return frame_copy
     
-    def start_continuous_detection(self, camera_index: int = 0, save_interval: int = 1):
-        """Start continuous object detection from camera"""
+    def start_continuous_detection(self, camera_index: int = 0, save_interval: int = 1,
+                                   show_video: bool = True, display_every: int = 1):
+        """Start continuous object detection from camera (save_interval is counted in batches)
+        
+        With show_video=False nothing is drawn or displayed and the loop only stops via
+        stop_detection(); otherwise every display_every-th frame is shown.
+        """
         self.is_detecting = True
+        self.show_video = show_video
+        self.display_every = max(1, display_every)
+        self._display_count = 0
+        self._stop_event.clear()
         self.detection_thread = threading.Thread(
             target=self._detection_loop, 
             args=(camera_index, save_interval)
@@ -79,8 +139,10 @@ class ObjectDetector:
     def stop_detection(self):
         """Stop continuous detection"""
         self.is_detecting = False
+        self._stop_event.set()
         if self.detection_thread:
             self.detection_thread.join()
+        self.visual_memory.flush()
     
     def _detection_loop(self, camera_index: int, save_interval: int):
         """Main detection loop running in separate thread"""
@@ -90,52 +152,110 @@ class ObjectDetector:
             print(f"Error: Could not open camera {camera_index}")
             return
         
-        frame_count = 0
+        # Capture runs on its own thread so inference never waits on cap.read()
+        grabber = FrameGrabber(cap).start()
+        frames = deque(maxlen=self.batch_size)
+        batch_count = 0
         
         try:
-            while self.is_detecting:
-                ret, frame = cap.read()
-                if not ret:
-                    print("Error: Could not read frame from camera")
-                    break
-                
-                # Detect objects
-                detections = self.detect_objects(frame)
+            while not self._stop_event.is_set():
+                frame = grabber.read()
+                if frame is None:
+                    if grabber.failed:
+                        print("Error: Could not read frame from camera")
+                        break
+                    continue
                 
-                # Draw detections on frame
-                frame_with_detections = self.draw_detections(frame, detections)
+                static = False
+                if self.skip_static_frames:
+                    frame_hash = self._frame_hash(frame)
+                    static = (self._last_hash is not None and
+                              bin(frame_hash ^ self._last_hash).count('1') < self.static_hash_threshold and
+                              time.monotonic() - self._last_inference_time < self.static_refresh_seconds)
+                    if not static:
+                        self._last_hash = frame_hash
                 
-                # Display frame
-                cv2.imshow('AI Home Assistant - Object Detection', frame_with_detections)
+                if static:
+                    # Scene unchanged since the last queued frame: reuse its detections, but first
+                    # infer any partial batch now so a change isn't held back until the next refresh
+                    if frames:
+                        self._infer_batch(list(frames), batch_count, save_interval)
+                        frames.clear()
+                        batch_count += 1
+                    if self._show_frame(frame, self._last_detections):
+                        break
+                    continue
                 
-                # Save detections to memory more frequently
-                if frame_count % save_interval == 0 and detections:
-                    self._save_detections_to_memory(detections, frame.shape[:2])
-                    print(f"📝 Saved {len(detections)} detections to memory")
+                frames.append(frame)
+                if len(frames) < self.batch_size:
+                    continue
                 
-                frame_count += 1
+                # Detect objects on the whole window with a single model call
+                batch = list(frames)
+                frames.clear()
+                batch_detections = self._infer_batch(batch, batch_count, save_interval)
+                batch_count += 1
                 
-                # Check for exit key
-                if cv2.waitKey(1) & 0xFF == ord('q'):
+                # Display only the newest frame so the window lags by at most one batch
+                if self._show_frame(batch[-1], batch_detections[-1]):
                     break
                     
         finally:
+            grabber.stop()
             cap.release()
-            cv2.destroyAllWindows()
+            if self.show_video:
+                cv2.destroyAllWindows()
     
-    def _save_detections_to_memory(self, detections: List[Dict], frame_size: Tuple[int, int]):
-        """Save detections to visual memory"""
-        for detection in detections:
-            bbox = detection['bbox']
-            location_description = self.visual_memory.get_location_for_bbox(bbox, frame_size, "zones.json")
-            
-            self.visual_memory.add_detection(
-                object_name=detection['class_name'],
-                confidence=detection['confidence'],
-                bbox=bbox,
-                frame_size=frame_size,
-                location_description=location_description
-            )
+    def _infer_batch(self, batch: List[np.ndarray], batch_count: int, save_interval: int) -> List[Detections]:
+        """Detect objects on a batch of frames, remember the newest result and save them to memory"""
+        batch_detections = self.detect_objects_batch(batch)
+        self._last_detections = batch_detections[-1]
+        self._last_inference_time = time.monotonic()
+        
+        # Save detections to memory more frequently
+        if batch_count % save_interval == 0:
+            saved = 0
+            for batch_frame, detections in zip(batch, batch_detections):
+                if detections:
+                    frame_height, frame_width = batch_frame.shape[:2]
+                    self._save_detections_to_memory(detections, (frame_width, frame_height))
+                    saved += len(detections)
+            if saved:
+                print(f"📝 Saved {saved} detections to memory")
+        
+        return batch_detections
+    
+    def _show_frame(self, frame: np.ndarray, detections: Detections) -> bool:
+        """Annotate and display a frame; returns True when the user pressed 'q'"""
+        if not self.show_video:
+            return False
+        # Only refresh the window every display_every-th frame so the GUI doesn't throttle inference
+        self._display_count += 1
+        if self._display_count % self.display_every:
+            return False
+        # The frame is not used after display, so annotate it in place
+        frame_with_detections = self.draw_detections(frame, detections, inplace=True)
+        cv2.imshow('AI Home Assistant - Object Detection', frame_with_detections)
+        return cv2.waitKey(1) & 0xFF == ord('q')
+    
+    @staticmethod
+    def _frame_hash(frame: np.ndarray) -> int:
+        """64-bit difference hash of a frame, used to spot near-duplicate frames"""
+        small = cv2.resize(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY), (9, 8), interpolation=cv2.INTER_AREA)
+        bits = small[:, 1:] > small[:, :-1]
+        return int(np.packbits(bits).view(np.uint64)[0])
+    
+    def _save_detections_to_memory(self, detections: Detections, frame_size: Tuple[int, int]):
+        """Save detections to visual memory (frame_size is (width, height))"""
+        locations = self.visual_memory.locations_for_bboxes(detections.bboxes, frame_size, "zones.json")
+        
+        self.visual_memory.add_detections(
+            object_names=detections.class_names,
+            confidences=detections.confs,
+            bboxes=detections.bboxes,
+            frame_size=frame_size,
+            location_descriptions=locations
+        )
     
     def get_detection_summary(self) -> Dict[str, Any]:
         """Get summary of recent detections"""
@@ -146,7 +266,7 @@ class ObjectDetector:
             'total_objects_detected': len(all_objects),
             'recent_detections_count': len(recent_detections),
             'objects_list': all_objects,
-            'recent_objects': list(set([d['object_name'] for d in recent_detections]))
+            'recent_objects': list(dict.fromkeys(d['object_name'] for d in recent_detections))
         }
         
         return summary
@@ -1,55 +1,141 @@
 import requests
 import json
-from typing import Dict, List, Any, Optional
+import os
+import numpy as np
+import time
+from requests.adapters import HTTPAdapter
+from typing import Dict, List, Any, Optional, Iterator
+
+# Bucket edges and labels for natural language location descriptions
+_X_EDGES = np.array([0.25, 0.4, 0.6, 0.75])
+_Y_EDGES = np.array([0.25, 0.4, 0.6, 0.75])
+_X_LABELS = ["far left", "left side", "center", "right side", "far right"]
+_Y_LABELS = ["top", "upper", "middle", "lower", "bottom"]
+
+# 4-bit K-quant Llama 3.2; set OLLAMA_MODEL to use another tag (e.g. an FP8 build on Ada/Hopper GPUs)
+DEFAULT_MODEL = "llama3.2:3b-instruct-q4_K_M"
 
 class OllamaClient:
     """Client for interacting with Ollama 3.2 for natural language processing"""
     
     def __init__(self, base_url: str = "http://localhost:11434"):
         self.base_url = base_url
-        self.model_name = "llama3.2"  # Using Llama 3.2 as specified
-        
-    def is_available(self) -> bool:
-        """Check if Ollama service is available"""
+        self.model_name = os.environ.get("OLLAMA_MODEL", DEFAULT_MODEL)
+        self.keep_alive = os.environ.get("OLLAMA_KEEP_ALIVE", "30m")  # keep the model loaded between questions
+        # Short factual answers: cap output tokens and context size to keep decode time low
+        self.options = {
+            "num_predict": 128,
+            "num_ctx": 2048,
+            "temperature": 0.2,
+            "top_p": 0.9,
+            "num_batch": 512
+        }
+        self.max_context_objects = 20  # most recently seen objects included in the prompt
+        # Keep-alive session so repeated calls reuse the TCP connection to Ollama
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=4)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+        # Cached result of the last availability probe
+        self._avail = False
+        self._avail_ts = float("-inf")
+        
+    def is_available(self, max_age: float = 5.0) -> bool:
+        """Check if Ollama service is available, reusing a probe result younger than max_age seconds"""
+        now = time.monotonic()
+        if now - self._avail_ts < max_age:
+            return self._avail
         try:
-            response = requests.get(f"{self.base_url}/api/tags", timeout=5)
-            return response.status_code == 200
+            response = self._session.get(f"{self.base_url}/api/tags", timeout=5)
+            self._avail = response.status_code == 200
         except:
+            self._avail = False
+        self._avail_ts = now
+        return self._avail
+    
+    def ensure_model(self) -> bool:
+        """Check that the configured model tag is installed and preload it into memory"""
+        try:
+            response = self._session.post(f"{self.base_url}/api/show",
+                                          json={"name": self.model_name}, timeout=5)
+            if response.status_code != 200:
+                print(f"⚠️  Ollama model '{self.model_name}' not found. Run: ollama pull {self.model_name}")
+                return False
+            # A generate request without a prompt just loads the model
+            self._session.post(f"{self.base_url}/api/generate",
+                               json={"model": self.model_name, "keep_alive": self.keep_alive},
+                               timeout=120)
+            return True
+        except Exception as e:
+            print(f"⚠️  Could not preload Ollama model '{self.model_name}': {e}")
             return False
     
     def generate_response(self, prompt: str, context: str = "") -> str:
         """Generate response using Ollama"""
-        if not self.is_available():
-            return "Ollama service is not available. Please make sure Ollama is running."
-        
+        return "".join(self.stream_response(prompt, context))
+    
+    def stream_response(self, prompt: str, context: str = "") -> Iterator[str]:
+        """Generate response using Ollama, yielding text chunks as soon as they arrive"""
+        # No availability probe here: callers already checked, and a dead server fails fast below
         full_prompt = f"{context}\n\nUser: {prompt}\nAssistant:"
         
         # retry on timeout a couple of times with simple backoff
         timeouts = [120, 120]
         for attempt, timeout_s in enumerate(timeouts, start=1):
+            received = False
             try:
-                response = requests.post(
+                with self._session.post(
                     f"{self.base_url}/api/generate",
                     json={
                         "model": self.model_name,
                         "prompt": full_prompt,
-                        "stream": False
+                        "stream": True,
+                        "keep_alive": self.keep_alive,
+                        "options": self.options
                     },
-                    timeout=timeout_s
-                )
-                if response.status_code == 200:
-                    result = response.json()
-                    return result.get('response', 'No response generated')
-                else:
-                    return f"Error: {response.status_code} - {response.text}"
+                    stream=True,
+                    timeout=(5, timeout_s)
+                ) as response:
+                    if response.status_code != 200:
+                        yield f"Error: {response.status_code} - {response.text}"
+                        return
+                    # Ollama streams one JSON object per line
+                    for line in response.iter_lines():
+                        if not line:
+                            continue
+                        chunk = json.loads(line)
+                        if 'error' in chunk:
+                            yield f"Error: {chunk['error']}"
+                            return
+                        text = chunk.get('response', '')
+                        if text:
+                            received = True
+                            yield text
+                        if chunk.get('done'):
+                            break
+                if not received:
+                    yield 'No response generated'
+                return
             except requests.exceptions.Timeout:
+                # A partial answer has already been shown; retrying would repeat it
+                if received:
+                    return
                 if attempt == len(timeouts):
-                    return "Request timed out. Please try again."
+                    yield "Request timed out. Please try again."
+            except requests.exceptions.ConnectionError:
+                self._avail, self._avail_ts = False, time.monotonic()
+                yield "Ollama service is not available. Please make sure Ollama is running."
+                return
             except Exception as e:
-                return f"Error communicating with Ollama: {str(e)}"
+                yield f"Error communicating with Ollama: {str(e)}"
+                return
     
     def answer_object_question(self, question: str, detection_data: List[Dict]) -> str:
         """Answer questions about object detections using context from visual memory"""
+        return "".join(self.answer_object_question_stream(question, detection_data))
+    
+    def answer_object_question_stream(self, question: str, detection_data: List[Dict]) -> Iterator[str]:
+        """Streaming variant of answer_object_question"""
         
         # Create context from detection data
         context = self._create_context_from_detections(detection_data)
@@ -65,41 +151,30 @@ class OllamaClient:
         4. Be conversational and helpful
         5. If you don't have information about an object, say so clearly
         
-        Context about recent object detections:
+        The following JSON lists recently detected objects, most recent first
+        (o=name, t=time last seen, l=location, c=confidence, n=number of detections):
         """
         
         full_context = f"{system_prompt}\n{context}"
         
-        return self.generate_response(question, full_context)
+        yield from self.stream_response(question, full_context)
     
     def _create_context_from_detections(self, detections: List[Dict]) -> str:
-        """Create context string from detection data"""
+        """Create context string from per-object rows (see VisualMemory.get_object_context)"""
         if not detections:
             return "No recent object detections available."
         
-        context_parts = []
-        
-        # Group detections by object name
-        object_groups = {}
-        for detection in detections:
-            obj_name = detection['object_name']
-            if obj_name not in object_groups:
-                object_groups[obj_name] = []
-            object_groups[obj_name].append(detection)
-        
-        # Create context for each object
-        for obj_name, obj_detections in object_groups.items():
-            latest = obj_detections[0]  # Most recent detection
-            
-            context_parts.append(
-                f"Object: {obj_name}\n"
-                f"Last seen: {latest['timestamp']}\n"
-                f"Location: {latest.get('location_description', 'Unknown location')}\n"
-                f"Confidence: {latest['confidence']:.2f}\n"
-                f"Total detections: {len(obj_detections)}\n"
-            )
-        
-        return "\n".join(context_parts)
+        # Compact JSON keeps the prompt (and so prefill time) small; keys are explained in the system prompt
+        return json.dumps([
+            {
+                "o": row['object_name'],
+                "t": row['timestamp'][5:19].replace('T', ' '),  # MM-DD HH:MM:SS
+                "l": row.get('location_description') or '?',
+                "c": round(row['confidence'], 2),
+                "n": row.get('detection_count', 1)
+            }
+            for row in detections[:self.max_context_objects]
+        ], separators=(',', ':'))
     
     def get_object_search_suggestions(self, partial_name: str, available_objects: List[str]) -> List[str]:
         """Get suggestions for object names based on partial input"""
@@ -118,37 +193,19 @@ class OllamaClient:
     
     def generate_location_description(self, bbox: tuple, frame_size: tuple) -> str:
         """Generate natural language description of object location"""
-        x, y, w, h = bbox
+        return self.describe_locations(np.array([bbox]), frame_size)[0]
+    
+    def describe_locations(self, bboxes: np.ndarray, frame_size: tuple) -> List[str]:
+        """Describe the location of every (x, y, w, h) box in an (N, 4) array"""
+        bboxes = np.asarray(bboxes, dtype=np.float64).reshape(-1, 4)
         frame_width, frame_height = frame_size
         
-        # Calculate relative position
-        center_x = x + w/2
-        center_y = y + h/2
-        
-        rel_x = center_x / frame_width
-        rel_y = center_y / frame_height
-        
-        # Generate natural language description
-        if rel_x < 0.25:
-            x_desc = "far left"
-        elif rel_x < 0.4:
-            x_desc = "left side"
-        elif rel_x < 0.6:
-            x_desc = "center"
-        elif rel_x < 0.75:
-            x_desc = "right side"
-        else:
-            x_desc = "far right"
+        # Calculate relative position of each box center
+        rel_x = (bboxes[:, 0] + bboxes[:, 2] / 2) / frame_width
+        rel_y = (bboxes[:, 1] + bboxes[:, 3] / 2) / frame_height
         
-        if rel_y < 0.25:
-            y_desc = "top"
-        elif rel_y < 0.4:
-            y_desc = "upper"
-        elif rel_y < 0.6:
-            y_desc = "middle"
-        elif rel_y < 0.75:
-            y_desc = "lower"
-        else:
-            y_desc = "bottom"
+        # side='right' so a value on an edge falls in the upper bucket, like the old `<` ladder
+        x_idx = np.searchsorted(_X_EDGES, rel_x, side='right')
+        y_idx = np.searchsorted(_Y_EDGES, rel_y, side='right')
         
-        return f"{y_desc} {x_desc} of the frame"
+        return [f"{_Y_LABELS[yi]} {_X_LABELS[xi]} of the frame" for xi, yi in zip(x_idx, y_idx)]
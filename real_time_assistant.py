@@ -2,7 +2,7 @@ import cv2
 import threading
 import time
 import os
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Iterator
 from object_detector import ObjectDetector
 from visual_memory import VisualMemory
 from ollama_client import OllamaClient
@@ -12,8 +12,9 @@ class RealTimeAIHomeAssistant:
     """Real-time AI Home Assistant with live detection and immediate Q&A"""
     
     def __init__(self, model_path: str = "yolo11n.pt"):
-        self.object_detector = ObjectDetector(model_path, confidence_threshold=0.25)  # Lower threshold
         self.visual_memory = VisualMemory()
+        self.object_detector = ObjectDetector(model_path, confidence_threshold=0.25,  # Lower threshold
+                                              visual_memory=self.visual_memory)
         self.ollama_client = OllamaClient()
         self.zone_tool = ZoneDefinitionTool()
         self.is_running = False
@@ -44,6 +45,7 @@ class RealTimeAIHomeAssistant:
             print("   Please make sure Ollama is running with: ollama serve")
         else:
             print("✅ Ollama service is available")
+            self.ollama_client.ensure_model()
         
         # Load and display zones
         zones = self.visual_memory.load_custom_zones(self.zones_file)
@@ -70,34 +72,32 @@ class RealTimeAIHomeAssistant:
     
     def ask_question(self, question: str) -> str:
         """Ask a question about object locations with real-time data"""
+        return "".join(self.ask_question_stream(question))
+    
+    def ask_question_stream(self, question: str) -> Iterator[str]:
+        """Ask a question about object locations with real-time data, yielding the answer as it is generated"""
         if not self.is_running:
-            return "Home assistant is not running. Please start it first."
+            yield "Home assistant is not running. Please start it first."
+            return
         
         # Get recent detections for context (last 5 minutes)
-        recent_detections = self.visual_memory.get_recent_detections(hours=0.08, limit=50)  # 5 minutes
+        recent_detections = self.visual_memory.get_object_context(hours=0.08, limit_objects=20)  # 5 minutes
         
         if not recent_detections:
-            return "I haven't detected any objects recently. Make sure the camera is working and objects are visible."
+            yield "I haven't detected any objects recently. Make sure the camera is working and objects are visible."
+            return
         
         # Use Ollama to answer the question
         if self.ollama_client.is_available():
-            return self.ollama_client.answer_object_question(question, recent_detections)
+            yield from self.ollama_client.answer_object_question_stream(question, recent_detections)
         else:
             # Fallback to simple text-based answers
-            return self._simple_answer(question, recent_detections)
+            yield self._simple_answer(question, recent_detections)
     
     def _simple_answer(self, question: str, detections: List[Dict]) -> str:
         """Simple fallback answer when Ollama is not available"""
-        question_lower = question.lower()
-        
         # Extract object name from question
-        detected_objects = self.visual_memory.get_all_objects()
-        mentioned_object = None
-        
-        for obj in detected_objects:
-            if obj.lower() in question_lower:
-                mentioned_object = obj
-                break
+        mentioned_object = self.visual_memory.find_mentioned_object(question)
         
         if mentioned_object:
             # Get history for the mentioned object
@@ -110,7 +110,7 @@ class RealTimeAIHomeAssistant:
                 return f"I don't have recent information about {mentioned_object}."
         else:
             # General information
-            recent_objects = list(set([d['object_name'] for d in detections]))
+            recent_objects = list(dict.fromkeys(d['object_name'] for d in detections))
             return f"I've recently detected these objects: {', '.join(recent_objects[:5])}. Ask me about any specific object!"
     
     def get_status(self) -> Dict[str, Any]:
@@ -201,8 +201,10 @@ def main():
                 elif user_input.lower() == 'zones':
                     assistant.redefine_zones()
                 elif user_input:
-                    answer = assistant.ask_question(user_input)
-                    print(f"🤖 Assistant: {answer}")
+                    print("🤖 Assistant: ", end="", flush=True)
+                    for chunk in assistant.ask_question_stream(user_input):
+                        print(chunk, end="", flush=True)
+                    print()
                     
             except KeyboardInterrupt:
                 break
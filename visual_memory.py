@@ -32,22 +32,54 @@ def load_recent(n: int = 50, since_ts: float = None, filename: str = MEMORY_FILE
     return results[-n:]
 
 import sqlite3
+import re
+import numpy as np
 import json
 import datetime
-from typing import List, Dict, Any
+import threading
+import atexit
+import time
+from typing import List, Dict, Any, Tuple, Optional
 import os
 
+_GRID_EDGES = np.array([0.33, 0.67])  # generic 3x3 grid used when no custom zone matches
+_GRID_X = np.array(["left", "center", "right"])
+_GRID_Y = np.array(["top", "middle", "bottom"])
+
 class VisualMemory:
     """Manages visual memory for object detection and location tracking"""
     
+    FLUSH_ROWS = 64  # flush buffered detections after this many rows...
+    FLUSH_SECONDS = 1.0  # ...or after this many seconds
+    
     def __init__(self, db_path: str = "visual_memory.db"):
         self.db_path = db_path
+        # One long-lived connection shared by the detection and question threads
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA temp_store=MEMORY")
+        self._lock = threading.Lock()
+        self._pending: List[tuple] = []
+        self._last_flush = time.monotonic()
+        # Parsed zones.json plus (x0, y0, x1, y1) per zone, reloaded only when the file's mtime changes
+        self._zones_file = None
+        self._zones_cache = None
+        self._zones_mtime = 0
+        # Distinct object names seen so far (dict keeps first-seen order) and the last row id scanned
+        self._objects: Dict[str, None] = {}
+        self._objects_max_id = 0
+        self.objects_version = 0  # bumped whenever a new object name shows up
+        # Alternation regex over the object names, rebuilt when objects_version changes
+        self._obj_pattern = None
+        self._obj_pattern_version = 0
+        self._obj_lower: Dict[str, str] = {}
         self.init_database()
+        atexit.register(self.close)
     
     def init_database(self):
         """Initialize SQLite database for storing object detection history"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        cursor = self._conn.cursor()
         
         # Create table for object detections
         cursor.execute('''
@@ -80,129 +112,239 @@ class VisualMemory:
             )
         ''')
         
-        conn.commit()
-        conn.close()
+        # Indexes for the "latest first" queries
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_ts ON object_detections(timestamp DESC)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_obj_ts ON object_detections(object_name, timestamp DESC)')
+    
+    def close(self):
+        """Flush pending detections, let SQLite refresh its planner stats and close the connection"""
+        with self._lock:
+            if self._conn is None:
+                return
+            self._flush_locked()
+            self._conn.execute("PRAGMA optimize")
+            self._conn.close()
+            self._conn = None
+        # Drop the exit hook too, so a closed instance is not kept alive until interpreter exit
+        atexit.unregister(self.close)
+    
+    def _connection(self) -> sqlite3.Connection:
+        """The open connection; caller must hold self._lock"""
+        if self._conn is None:
+            raise sqlite3.ProgrammingError("VisualMemory is closed")
+        return self._conn
     
     def add_detection(self, object_name: str, confidence: float, bbox: tuple, 
                      frame_size: tuple, location_description: str = None, 
                      image_path: str = None):
-        """Add a new object detection to memory"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
+        """Add a new object detection to memory (buffered, see flush)"""
         timestamp = datetime.datetime.now().isoformat()
         x, y, w, h = bbox
         frame_width, frame_height = frame_size
         
-        cursor.execute('''
-            INSERT INTO object_detections 
-            (timestamp, object_name, confidence, bbox_x, bbox_y, bbox_width, bbox_height,
-             frame_width, frame_height, location_description, image_path)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (timestamp, object_name, confidence, x, y, w, h, 
-              frame_width, frame_height, location_description, image_path))
+        with self._lock:
+            if object_name not in self._objects:
+                self._objects[object_name] = None
+                self.objects_version += 1
+            self._pending.append((timestamp, object_name, confidence, x, y, w, h,
+                                  frame_width, frame_height, location_description, image_path))
+            if (len(self._pending) >= self.FLUSH_ROWS or
+                    time.monotonic() - self._last_flush >= self.FLUSH_SECONDS):
+                self._flush_locked()
+    
+    def add_detections(self, object_names: List[str], confidences: np.ndarray, bboxes: np.ndarray,
+                       frame_size: tuple, location_descriptions: List[str]):
+        """Add all detections of one frame, given as parallel arrays, under a single lock"""
+        timestamp = datetime.datetime.now().isoformat()
+        frame_width, frame_height = frame_size
         
-        conn.commit()
-        conn.close()
+        rows = [(timestamp, name, conf, x, y, w, h, frame_width, frame_height, location, None)
+                for name, conf, (x, y, w, h), location in zip(object_names,
+                                                                np.asarray(confidences).tolist(),
+                                                                np.asarray(bboxes).tolist(),
+                                                                location_descriptions)]
+        with self._lock:
+            known = len(self._objects)
+            for name in object_names:
+                self._objects.setdefault(name)
+            if len(self._objects) != known:
+                self.objects_version += 1
+            self._pending.extend(rows)
+            if (len(self._pending) >= self.FLUSH_ROWS or
+                    time.monotonic() - self._last_flush >= self.FLUSH_SECONDS):
+                self._flush_locked()
+    
+    def add_detections_arr(self, detections: np.ndarray, zone_names: np.ndarray,
+                           class_names: Dict[int, str], frame_size: tuple):
+        """Add one frame's detections from a structured array with cls, conf, x, y, w, h and zone fields"""
+        # Zone -1 (full-frame detections) picks the name appended at the end
+        locations = np.append(np.asarray(zone_names, dtype=object), 'full_frame')[detections['zone']]
+        self.add_detections(
+            object_names=[class_names[class_id] for class_id in detections['cls'].tolist()],
+            confidences=detections['conf'],
+            bboxes=np.stack([detections['x'], detections['y'], detections['w'], detections['h']], axis=1),
+            frame_size=frame_size,
+            location_descriptions=locations.tolist()
+        )
+    
+    def flush(self):
+        """Write buffered detections to the database"""
+        with self._lock:
+            self._flush_locked()
+    
+    def _flush_locked(self):
+        """Insert all pending rows in one transaction; caller must hold self._lock"""
+        self._last_flush = time.monotonic()
+        if not self._pending:
+            return
+        rows, self._pending = self._pending, []
+        if self._conn is None:
+            # Detection threads can still be saving while the app shuts down: drop their rows
+            return
+        self._conn.execute("BEGIN")
+        try:
+            self._conn.executemany('''
+                INSERT INTO object_detections 
+                (timestamp, object_name, confidence, bbox_x, bbox_y, bbox_width, bbox_height,
+                 frame_width, frame_height, location_description, image_path)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', rows)
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+    
+    def _query(self, sql: str, params: tuple = ()) -> List[Dict]:
+        """Run a SELECT after flushing pending rows and return rows as dicts"""
+        with self._lock:
+            self._flush_locked()
+            cursor = self._connection().execute(sql, params)
+            columns = [description[0] for description in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
     
     def get_object_history(self, object_name: str, limit: int = 10) -> List[Dict]:
         """Get detection history for a specific object"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
+        return self._query('''
             SELECT * FROM object_detections 
             WHERE object_name = ? 
             ORDER BY timestamp DESC 
             LIMIT ?
         ''', (object_name, limit))
-        
-        columns = [description[0] for description in cursor.description]
-        results = [dict(zip(columns, row)) for row in cursor.fetchall()]
-        
-        conn.close()
-        return results
     
     def get_recent_detections(self, hours: int = 24, limit: int = 50) -> List[Dict]:
         """Get recent detections within specified hours"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
         cutoff_time = (datetime.datetime.now() - datetime.timedelta(hours=hours)).isoformat()
         
-        cursor.execute('''
+        return self._query('''
             SELECT * FROM object_detections 
             WHERE timestamp > ? 
             ORDER BY timestamp DESC 
             LIMIT ?
         ''', (cutoff_time, limit))
+    
+    def get_object_context(self, hours: float = 24, limit_objects: int = 20) -> List[Dict]:
+        """One row per object seen within the last hours: its latest detection plus a detection_count"""
+        cutoff_time = (datetime.datetime.now() - datetime.timedelta(hours=hours)).isoformat()
         
-        columns = [description[0] for description in cursor.description]
-        results = [dict(zip(columns, row)) for row in cursor.fetchall()]
-        
-        conn.close()
-        return results
+        return self._query('''
+            SELECT object_name, timestamp, location_description, confidence, detection_count
+            FROM (
+                SELECT object_name, timestamp, location_description, confidence,
+                       ROW_NUMBER() OVER (PARTITION BY object_name ORDER BY timestamp DESC) AS rn,
+                       COUNT(*) OVER (PARTITION BY object_name) AS detection_count
+                FROM object_detections
+                WHERE timestamp > ?
+            )
+            WHERE rn = 1
+            ORDER BY timestamp DESC
+            LIMIT ?
+        ''', (cutoff_time, limit_objects))
     
     def search_objects_by_location(self, location_keyword: str) -> List[Dict]:
         """Search for objects detected in specific locations"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
+        return self._query('''
             SELECT * FROM object_detections 
             WHERE location_description LIKE ? 
             ORDER BY timestamp DESC
         ''', (f'%{location_keyword}%',))
-        
-        columns = [description[0] for description in cursor.description]
-        results = [dict(zip(columns, row)) for row in cursor.fetchall()]
-        
-        conn.close()
-        return results
     
     def get_all_objects(self) -> List[str]:
         """Get list of all unique objects detected"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT DISTINCT object_name FROM object_detections')
-        results = [row[0] for row in cursor.fetchall()]
-        
-        conn.close()
-        return results
+        with self._lock:
+            self._flush_locked()
+            # Only scan rows added since the last call (including rows from other writers)
+            conn = self._connection()
+            max_id = conn.execute('SELECT MAX(id) FROM object_detections').fetchone()[0] or 0
+            if max_id > self._objects_max_id:
+                cursor = conn.execute(
+                    'SELECT DISTINCT object_name FROM object_detections WHERE id > ? AND id <= ?',
+                    (self._objects_max_id, max_id))
+                known = len(self._objects)
+                for (object_name,) in cursor:
+                    self._objects.setdefault(object_name)
+                if len(self._objects) != known:
+                    self.objects_version += 1
+                self._objects_max_id = max_id
+            return list(self._objects)
+    
+    def find_mentioned_object(self, text: str) -> Optional[str]:
+        """Return the detected object name mentioned in text, if any"""
+        objects = self.get_all_objects()
+        if not objects:
+            return None
+        if self.objects_version != self._obj_pattern_version:
+            # Longest names first so "cell phone" wins over "phone"; no trailing \b so plurals match
+            names = sorted(objects, key=len, reverse=True)
+            self._obj_pattern = re.compile(r'\b(' + '|'.join(re.escape(o) for o in names) + ')', re.I)
+            self._obj_lower = {o.lower(): o for o in objects}
+            self._obj_pattern_version = self.objects_version
+        m = self._obj_pattern.search(text)
+        return self._obj_lower[m.group(1).lower()] if m else None
     
     def add_location(self, name: str, description: str, bbox: tuple = None):
         """Add or update a location definition"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        if bbox:
-            x_min, y_min, x_max, y_max = bbox
-            cursor.execute('''
-                INSERT OR REPLACE INTO locations 
-                (name, description, x_min, y_min, x_max, y_max)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', (name, description, x_min, y_min, x_max, y_max))
-        else:
-            cursor.execute('''
-                INSERT OR REPLACE INTO locations 
-                (name, description)
-                VALUES (?, ?)
-            ''', (name, description))
-        
-        conn.commit()
-        conn.close()
+        with self._lock:
+            conn = self._connection()
+            if bbox:
+                x_min, y_min, x_max, y_max = bbox
+                conn.execute('''
+                    INSERT OR REPLACE INTO locations 
+                    (name, description, x_min, y_min, x_max, y_max)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', (name, description, x_min, y_min, x_max, y_max))
+            else:
+                conn.execute('''
+                    INSERT OR REPLACE INTO locations 
+                    (name, description)
+                    VALUES (?, ?)
+                ''', (name, description))
     
     def load_custom_zones(self, zones_file: str = "zones.json") -> List[Dict]:
-        """Load custom zones from JSON file"""
-        if os.path.exists(zones_file):
-            try:
-                with open(zones_file, 'r') as f:
-                    zones = json.load(f)
-                return zones
-            except Exception as e:
-                print(f"Warning: Could not load zones from {zones_file}: {e}")
-        return []
+        """Load custom zones from JSON file (cached until the file changes)"""
+        return self._load_zones_with_rects(zones_file)[0]
+    
+    def _load_zones_with_rects(self, zones_file: str) -> Tuple[List[Dict], np.ndarray]:
+        """Return (zones, rects) where rects is a (Z, 4) array of zone corners"""
+        try:
+            mtime = os.stat(zones_file).st_mtime
+        except OSError:
+            return [], np.empty((0, 4), dtype=np.float32)
+        
+        if zones_file == self._zones_file and mtime == self._zones_mtime:
+            return self._zones_cache
+        
+        try:
+            with open(zones_file, 'r') as f:
+                zones = json.load(f)
+        except Exception as e:
+            print(f"Warning: Could not load zones from {zones_file}: {e}")
+            return [], np.empty((0, 4), dtype=np.float32)
+        
+        rects = np.array([zone["bbox"] for zone in zones], dtype=np.float32).reshape(-1, 4)
+        rects[:, 2:] += rects[:, :2]  # (x, y, w, h) -> (x0, y0, x1, y1)
+        self._zones_cache = (zones, rects)
+        self._zones_file, self._zones_mtime = zones_file, mtime
+        return self._zones_cache
     
     def get_location_for_bbox(self, bbox: tuple, frame_size: tuple, zones_file: str = "zones.json") -> str:
         """Determine location description based on bounding box position and custom zones"""
@@ -213,17 +355,14 @@ class VisualMemory:
         center_x = x + w/2
         center_y = y + h/2
         
-        # First, check if object is in any custom zone
-        custom_zones = self.load_custom_zones(zones_file)
+        # First, check if object is in any custom zone (first matching zone wins)
+        custom_zones, rects = self._load_zones_with_rects(zones_file)
         
-        for zone in custom_zones:
-            zone_x, zone_y, zone_w, zone_h = zone["bbox"]
-            zone_name = zone["name"]
-            
-            # Check if object center is within zone
-            if (zone_x <= center_x <= zone_x + zone_w and 
-                zone_y <= center_y <= zone_y + zone_h):
-                return zone_name
+        if custom_zones:
+            inside = np.logical_and.reduce((center_x >= rects[:, 0], center_x <= rects[:, 2],
+                                            center_y >= rects[:, 1], center_y <= rects[:, 3]))
+            if inside.any():
+                return custom_zones[int(inside.argmax())]["name"]
         
         # If not in any custom zone, use generic location mapping
         rel_x = center_x / frame_width
@@ -245,3 +384,29 @@ class VisualMemory:
             y_region = "bottom"
         
         return f"{y_region}-{x_region} area"
+    
+    def locations_for_bboxes(self, bboxes: np.ndarray, frame_size: tuple,
+                             zones_file: str = "zones.json") -> List[str]:
+        """Vectorized get_location_for_bbox for an (N, 4) array of (x, y, w, h) boxes"""
+        bboxes = np.asarray(bboxes, dtype=np.float32).reshape(-1, 4)
+        frame_width, frame_height = frame_size
+        
+        cx = bboxes[:, 0] + bboxes[:, 2] / 2
+        cy = bboxes[:, 1] + bboxes[:, 3] / 2
+        
+        # Generic grid location for every box
+        x_idx = np.digitize(cx / frame_width, _GRID_EDGES)
+        y_idx = np.digitize(cy / frame_height, _GRID_EDGES)
+        locations = np.char.add(np.char.add(_GRID_Y[y_idx], "-"),
+                                np.char.add(_GRID_X[x_idx], " area")).astype(object)
+        
+        # Override with the first custom zone containing each center, if any
+        custom_zones, rects = self._load_zones_with_rects(zones_file)
+        if custom_zones and len(bboxes):
+            inside = ((cx[:, None] >= rects[:, 0]) & (cx[:, None] <= rects[:, 2]) &
+                      (cy[:, None] >= rects[:, 1]) & (cy[:, None] <= rects[:, 3]))
+            hit = inside.any(axis=1)
+            zone_names = np.array([zone["name"] for zone in custom_zones], dtype=object)
+            locations[hit] = zone_names[inside.argmax(axis=1)[hit]]
+        
+        return locations.tolist()
@@ -1,8 +1,82 @@
 import cv2
+import hashlib
 import json
+import numpy as np
 import os
+import queue
+import threading
 import time
 from typing import List, Dict, Tuple
+from camera import FrameGrabber, open_camera
+
+try:
+    import orjson
+
+    def _dumps(obj) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+
+    def _loads(data: bytes):
+        return orjson.loads(data)
+except ImportError:
+    def _dumps(obj) -> bytes:
+        return json.dumps(obj, indent=2).encode("utf-8")
+
+    def _loads(data: bytes):
+        return json.loads(data)
+
+def _digest(payload: bytes) -> bytes:
+    """Short content hash used to detect no-op zone saves"""
+    return hashlib.blake2b(payload, digest_size=8).digest()
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+def _binary_path(filename: str) -> str:
+    """Path of the msgpack copy written next to a zones JSON file"""
+    return os.path.splitext(filename)[0] + ".msgpack"
+
+def _pack_zones(zones: List[Dict]) -> bytes:
+    """Zones as msgpack (name, x, y, w, h, created_at) records, without repeating field names"""
+    return msgpack.packb([(zone.get("name"), *zone["bbox"], zone.get("created_at")) for zone in zones],
+                         use_bin_type=True)
+
+def _unpack_zones(data: bytes) -> List[Dict]:
+    """Inverse of _pack_zones"""
+    zones = []
+    for name, x, y, w, h, created_at in msgpack.unpackb(data, raw=False):
+        zone = {"name": name, "bbox": [x, y, w, h]}
+        if created_at is not None:
+            zone["created_at"] = created_at
+        zones.append(zone)
+    return zones
+
+# fdatasync skips the metadata flush that fsync does; it is not available on macOS or Windows
+_datasync = getattr(os, "fdatasync", os.fsync)
+_WRITE_FLAGS = os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0)
+
+def _atomic_write(path: str, payload: bytes):
+    """Write payload to path via a tmp file + fdatasync + rename"""
+    tmp = path + ".tmp"
+    try:
+        # Raw fd: no Python file object or extra userspace buffer between payload and the kernel
+        fd = os.open(tmp, _WRITE_FLAGS, 0o644)
+        try:
+            view = memoryview(payload)
+            while view:
+                view = view[os.write(fd, view):]
+            _datasync(fd)
+        finally:
+            os.close(fd)
+        os.replace(tmp, path)
+    except Exception:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+_PROMPT_HEIGHT = 70  # pixel rows the zone naming prompt can cover at the top of the window
+_OPENCL_MIN_PIXELS = 1920 * 1080  # below this, upload/blend overhead outweighs the GPU
 
 class ZoneDefinitionTool:
     """Tool for defining custom zones in camera feed by mouse interaction"""
@@ -12,127 +86,356 @@ class ZoneDefinitionTool:
         self.current_zone = None  # Current zone being drawn
         self.drawing = False
         self.start_point = None
-        self.end_point = None
+        # Latest cursor position while dragging; sampled once per rendered frame
+        self._last_move_x = 0
+        self._last_move_y = 0
         self.frame = None
         self.window_name = "Zone Definition Tool - Draw zones and press S to save, Q to quit"
         self.filename = "zones.json"
+        # Completed zones are rendered once into an overlay and re-blitted each frame
+        self._zones_version = 0  # bumped whenever self.zones changes
+        # Parallel (SoA) view of self.zones for vectorized point-in-zone tests
+        self._bbox_arr = np.empty((0, 4), np.int32)  # (x, y, w, h) per zone
+        self._edge_cols = np.empty((4, 0), np.int32)  # x0, y0, x1, y1 rows, right/bottom edges precomputed
+        self._names: List[str] = []
+        self._overlay_idx = None
+        self._overlay_alpha = None
+        self._overlay_px = None
+        self._overlay_key = None
+        self._overlay_coverage = None
+        self._overlay_umats = None  # (zone color, frame weight, zone weight) for the OpenCL path
+        self._opencl = cv2.ocl.haveOpenCL()
+        # Naming prompt text pixels (indices, coverage, premultiplied color), re-rendered only when it changes
+        self._prompt_pixels = None
+        self._prompt_key = None
+        # Finished rectangles wait here until they are named with the keyboard in the window
+        self._pending_zones: List[List[int]] = []
+        self._awaiting_name = False
+        self._name_buf = ""
+        # Zone snapshots are written by a background thread so the mouse callback never blocks on fsync
+        self._save_lock = threading.Lock()
+        self._save_queue = queue.Queue()
+        self._last_saved_hash = None  # (filename, digest) of the last content written or loaded
+        self._save_thread = threading.Thread(target=self._save_worker, daemon=True)
+        self._save_thread.start()
         
     def mouse_callback(self, event, x, y, flags, param):
         """Handle mouse events for drawing zones"""
         if event == cv2.EVENT_LBUTTONDOWN:
             self.start_point = (x, y)
-            self.end_point = (x, y)
+            self._last_move_x = x
+            self._last_move_y = y
             self.drawing = True
 
         elif event == cv2.EVENT_MOUSEMOVE:
             if self.drawing:
-                self.end_point = (x, y)
+                self._last_move_x = x
+                self._last_move_y = y
 
         elif event == cv2.EVENT_LBUTTONUP:
             if self.drawing and self.start_point:
-                self.end_point = (x, y)
                 x0, y0 = self.start_point
-                x1, y1 = self.end_point
+                x1, y1 = x, y
                 x_min, y_min = min(x0, x1), min(y0, y1)
                 w, h = abs(x1 - x0), abs(y1 - y0)
-                zone_name = input("Enter zone name: ").strip() or f"zone_{len(self.zones)+1}"
-                zone = {"name": zone_name, "bbox": [int(x_min), int(y_min), int(w), int(h)], "created_at": time.time()}
-                self.zones.append(zone)
+                # Naming happens in run() so the GUI thread never blocks on input()
+                self._pending_zones.append([int(x_min), int(y_min), int(w), int(h)])
+                self._awaiting_name = True
                 self.drawing = False
                 self.start_point = None
-                self.end_point = None
-                self.save_zones(self.filename)
-                print(f"[zone saved] {zone_name} -> {self.filename}")
+    
+    def _handle_name_key(self, key: int):
+        """Feed one key press to the in-window zone naming prompt"""
+        if key in (13, 10):  # Enter
+            bbox = self._pending_zones.pop(0)
+            zone_name = self._name_buf.strip() or f"zone_{len(self.zones)+1}"
+            zone = {"name": zone_name, "bbox": bbox, "created_at": time.time()}
+            self.zones.append(zone)
+            self._zones_changed()
+            self._save_queue.put((list(self.zones), self.filename))
+            print(f"[zone saved] {zone_name} -> {self.filename}")
+        elif key == 27:  # Esc
+            self._pending_zones.pop(0)
+            print("[cancelled] zone discarded")
+        elif key in (8, 127):  # Backspace
+            self._name_buf = self._name_buf[:-1]
+            return
+        elif 32 <= key <= 126:
+            self._name_buf += chr(key)
+            return
+        else:
+            return
+        self._name_buf = ""
+        self._awaiting_name = bool(self._pending_zones)
 
-    def draw_zones(self, frame):
-        """Draw all defined zones on the frame"""
-        frame_copy = frame.copy()
+    def _zones_changed(self):
+        """Invalidate the overlay cache and rebuild the zone arrays after self.zones changed"""
+        self._zones_version += 1
+        self._bbox_arr = np.array([zone["bbox"] for zone in self.zones], dtype=np.int32).reshape(-1, 4)
+        x, y, w, h = self._bbox_arr.T
+        self._edge_cols = np.ascontiguousarray(np.stack([x, y, x + w, y + h]))
+        self._names = [zone.get("name", f"zone{i}") for i, zone in enumerate(self.zones)]
+    
+    def zones_as_arrays(self) -> Tuple[np.ndarray, List[str]]:
+        """Zones as a (Z, 4) int32 array of (x, y, w, h) plus the matching list of names"""
+        return self._bbox_arr, self._names
+    
+    def assign(self, cx: np.ndarray, cy: np.ndarray) -> np.ndarray:
+        """Index of the first zone containing each point (cx[i], cy[i]), or -1 when none does"""
+        # Imported on first use: loading numba and compiling the kernel is only paid by callers of assign()
+        from zone_kernels import assign_zones
+        return assign_zones(cx, cy, *self._edge_cols)
+    
+    def _annotate(self, frame):
+        """Annotate a frame for display; large frames go through OpenCL when it is available"""
+        if self._opencl and frame.shape[0] * frame.shape[1] >= _OPENCL_MIN_PIXELS:
+            return self._annotate_umat(frame)
+        return self._annotate_inplace(frame)
+    
+    def _annotate_inplace(self, frame):
+        """Draw all defined zones directly onto frame and return it"""
+        self._ensure_overlay(frame.shape)
         
-        # Draw completed zones
-        for i, zone in enumerate(self.zones):
-            x, y, w, h = zone["bbox"]
-            cv2.rectangle(frame_copy, (x, y), (x + w, y + h), (0, 255, 0), 2)
-            cv2.putText(frame_copy, zone.get("name", f"zone{i}"), (x, y - 6), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0,255,0), 2)
+        # Blend completed zones from the cached overlay (only the pixels they cover)
+        ys, xs = self._overlay_idx
+        frame[ys, xs] = frame[ys, xs] * (1 - self._overlay_alpha) + self._overlay_px
         
-        # Draw current zone being drawn
-        if self.start_point and self.end_point and self.drawing:
+        self._draw_live(frame)
+        self._draw_prompt(frame)
+        return frame
+    
+    def _annotate_umat(self, frame) -> cv2.UMat:
+        """_annotate_inplace on the GPU: one upload, a full-frame blend in OpenCL, no download"""
+        self._ensure_overlay(frame.shape)
+        if self._overlay_umats is None:
+            # Zone strokes are all one color, so blending with a solid image weighted by coverage matches the CPU path
+            alpha = self._overlay_coverage.astype(np.float32) / 255.0
+            self._overlay_umats = (cv2.UMat(np.full(frame.shape, (0, 255, 0), dtype=np.uint8)),
+                                   cv2.UMat(1.0 - alpha), cv2.UMat(alpha))
+        zone_color, frame_weight, zone_weight = self._overlay_umats
+        uframe = cv2.blendLinear(cv2.UMat(frame), zone_color, frame_weight, zone_weight)
+        self._draw_live(uframe)
+        if self._awaiting_name:
+            # Prompt goes on top like in _annotate_inplace: round-trip only the rows it can cover
+            band = cv2.UMat(uframe, (0, min(_PROMPT_HEIGHT, frame.shape[0])), (0, frame.shape[1]))
+            top = band.get()
+            self._draw_prompt(top)
+            cv2.copyTo(cv2.UMat(top), None, band)
+        return uframe
+    
+    def _ensure_overlay(self, shape):
+        """Rebuild the cached zone overlay when the zones or the frame shape changed"""
+        key = (shape, len(self.zones), self._zones_version)
+        if key != self._overlay_key:
+            self._build_overlay(shape)
+            self._overlay_key = key
+    
+    def _draw_prompt(self, frame: np.ndarray):
+        """While a zone is being named, blend the cached prompt text onto the frame"""
+        if not self._awaiting_name:
+            return
+        # The text is only rasterized when the typed name changes
+        key = (frame.shape[:2], self._name_buf)
+        if key != self._prompt_key:
+            self._build_prompt(frame.shape)
+            self._prompt_key = key
+        ys, xs, alpha, px = self._prompt_pixels
+        frame[ys, xs] = frame[ys, xs] * (1 - alpha) + px
+    
+    def _draw_live(self, img):
+        """Draw the rubber band and not-yet-named rectangles (img may be an ndarray or a UMat)"""
+        if self.start_point and self.drawing:
             x0, y0 = self.start_point
-            x1, y1 = self.end_point
-            cv2.rectangle(frame_copy, (x0, y0), (x1, y1), (0, 165, 255), 2)
+            x1, y1 = self._last_move_x, self._last_move_y
+            cv2.rectangle(img, (x0, y0), (x1, y1), (0, 165, 255), 2)
         
-        return frame_copy
+        # Rectangles still waiting for a name
+        if self._awaiting_name:
+            for x, y, w, h in self._pending_zones:
+                cv2.rectangle(img, (x, y), (x + w, y + h), (0, 165, 255), 2)
+    
+    def _build_prompt(self, shape):
+        """Render the naming prompt once: covered pixel indices, their coverage and premultiplied color"""
+        height = min(_PROMPT_HEIGHT, shape[0])
+        canvas = np.zeros((height, shape[1], 3), dtype=np.uint8)
+        coverage = np.zeros((height, shape[1]), dtype=np.uint8)  # same strokes in white, for anti-aliased edges
+        for img, color in ((canvas, (0, 165, 255)), (coverage, 255)):
+            cv2.putText(img, f"Zone name: {self._name_buf}_", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, color, 2)
+            cv2.putText(img, "ENTER to confirm, ESC to cancel", (10, 58), cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
+        ys, xs = np.nonzero(coverage)
+        self._prompt_pixels = (ys, xs, (coverage[ys, xs] / 255.0).astype(np.float32)[:, None],
+                               canvas[ys, xs].astype(np.float32))
+    
+    def _build_overlay(self, shape):
+        """Render all completed zones once: covered pixel indices, their coverage and premultiplied color"""
+        overlay = np.zeros(shape, dtype=np.uint8)
+        coverage = np.zeros(shape[:2], dtype=np.uint8)  # same strokes in white, for anti-aliased edges
+        for i, zone in enumerate(self.zones):
+            x, y, w, h = zone["bbox"]
+            name = zone.get("name", f"zone{i}")
+            for img, color in ((overlay, (0, 255, 0)), (coverage, 255)):
+                cv2.rectangle(img, (x, y), (x + w, y + h), color, 2)
+                cv2.putText(img, name, (x, y - 6), cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
+        self._overlay_coverage = coverage
+        self._overlay_umats = None
+        self._overlay_idx = np.nonzero(coverage)
+        self._overlay_alpha = (coverage[self._overlay_idx] / 255.0).astype(np.float32)[:, None]
+        self._overlay_px = overlay[self._overlay_idx].astype(np.float32)
     
     def save_zones(self, filename: str = None):
         """Save zones to JSON file (atomic)"""
         if filename is None:
             filename = self.filename
-        tmp = filename + ".tmp"
-        try:
-            with open(tmp, "w", encoding="utf-8") as f:
-                json.dump(self.zones, f, indent=2)
-                f.flush()
-                os.fsync(f.fileno())
-            os.replace(tmp, filename)
-            # write a small mtime hint file so detectors can notice
+        # Let queued background saves land first so they can't overwrite this newer state
+        self._save_queue.join()
+        return self._write_zones(self.zones, filename)
+    
+    def _save_worker(self):
+        """Background thread: persist the newest queued zone snapshot"""
+        while True:
+            zones, filename = self._save_queue.get()
+            skipped = 0
+            # Only the latest snapshot matters, drop any older ones still queued
+            while True:
+                try:
+                    zones, filename = self._save_queue.get_nowait()
+                    skipped += 1
+                except queue.Empty:
+                    break
+            try:
+                self._write_zones(zones, filename)
+            finally:
+                for _ in range(skipped + 1):
+                    self._save_queue.task_done()
+    
+    def _write_zones(self, zones: List[Dict], filename: str) -> bool:
+        """Atomically write zones to filename, plus the msgpack copy when msgpack is installed"""
+        with self._save_lock:
             try:
-                with open(filename + ".updated", "w", encoding="utf-8") as h:
-                    h.write(str(time.time()))
-            except Exception:
-                pass
+                payload = _dumps(zones)
+                saved_hash = (filename, _digest(payload))
+                # Nothing changed since the last write: skip the fsync and rename
+                if saved_hash == self._last_saved_hash and os.path.exists(filename):
+                    return True
+                # os.replace also bumps the file's mtime, which is what detectors watch
+                _atomic_write(filename, payload)
+                # Written second, so it is the newer file and load_zones prefers it
+                if msgpack is not None:
+                    _atomic_write(_binary_path(filename), _pack_zones(zones))
+                self._last_saved_hash = saved_hash
+                return True
+            except Exception as e:
+                print("Error saving zones:", e)
+                return False
+    
+    def save_zones_binary(self, filename: str = None) -> bool:
+        """Save zones to a compact msgpack file (next to zones.json by default)"""
+        if msgpack is None:
+            print("⚠️  msgpack is not installed, binary zones are unavailable")
+            return False
+        if filename is None:
+            filename = _binary_path(self.filename)
+        try:
+            _atomic_write(filename, _pack_zones(self.zones))
             return True
         except Exception as e:
             print("Error saving zones:", e)
-            if os.path.exists(tmp):
-                os.remove(tmp)
+            return False
+    
+    def load_zones_binary(self, filename: str = None) -> bool:
+        """Load zones from a msgpack file written by save_zones_binary"""
+        if msgpack is None:
+            return False
+        if filename is None:
+            filename = _binary_path(self.filename)
+        try:
+            with open(filename, "rb") as f:
+                self.zones = _unpack_zones(f.read())
+            self._zones_changed()
+            return True
+        except Exception as e:
+            print("Error loading zones:", e)
             return False
     
     def load_zones(self, filename: str = None):
-        """Load zones from JSON file"""
+        """Load zones from JSON file, or from its msgpack copy when that is at least as new"""
         if filename is None:
             filename = self.filename
         if not os.path.exists(filename):
             return False
         try:
-            with open(filename, "r", encoding="utf-8") as f:
-                self.zones = json.load(f)
+            binary = _binary_path(filename)
+            # JSON stays the hand-editable source: a newer zones.json wins over the binary copy
+            use_binary = (msgpack is not None and os.path.exists(binary)
+                          and os.path.getmtime(binary) >= os.path.getmtime(filename))
+            if not (use_binary and self.load_zones_binary(binary)):
+                with open(filename, "rb") as f:
+                    self.zones = _loads(f.read())
+                self._zones_changed()
+            with self._save_lock:
+                self._last_saved_hash = (filename, _digest(_dumps(self.zones)))
             return True
         except Exception as e:
             print("Error loading zones:", e)
             return False
     
+    # Key handlers for run(); each returns True to leave the loop
+    def _key_save(self) -> bool:
+        self.save_zones(self.filename)
+        print("[saved zones] saved and exiting")
+        return True
+    
+    def _key_quit(self) -> bool:
+        print("[quit] exiting without further action")
+        return True
+    
+    def _key_load(self) -> bool:
+        self.load_zones(self.filename)
+        print(f"[loaded zones] {len(self.zones)} zones")
+        return False
+    
+    def _key_clear(self) -> bool:
+        self.zones = []
+        self._zones_changed()
+        print("[cleared] all zones removed")
+        return False
+    
+    _KEY_HANDLERS = {ord('s'): _key_save, ord('q'): _key_quit, ord('l'): _key_load, ord('c'): _key_clear}
+    
     def run(self, camera_index: int = 0):
         """Main function to run the zone definition tool"""
         print("🎯 Zone Definition Tool")
-        cap = cv2.VideoCapture(camera_index)
+        cap = open_camera(camera_index)
         cv2.namedWindow(self.window_name, cv2.WINDOW_NORMAL)
         cv2.setMouseCallback(self.window_name, self.mouse_callback)
         if os.path.exists(self.filename):
             self.load_zones(self.filename)
             print(f"[loaded zones] {len(self.zones)} zones")
+        # Capture on its own thread so rendering never blocks on the next USB frame
+        grabber = FrameGrabber(cap).start()
         try:
             while True:
-                ret, frame = cap.read()
-                if not ret:
-                    break
-                display = self.draw_zones(frame)
-                cv2.imshow(self.window_name, display)
-                key = cv2.waitKey(20) & 0xFF
-                if key == ord('s'):
-                    self.save_zones(self.filename)
-                    print("[saved zones] saved and exiting")
-                    break
-                elif key == ord('q'):
-                    print("[quit] exiting without further action")
+                frame = grabber.read()
+                if frame is None:
+                    if grabber.failed:
+                        break
+                    continue
+                # Every grabbed frame is a fresh buffer, so annotate it directly
+                cv2.imshow(self.window_name, self._annotate(frame))
+                key = cv2.waitKey(15) & 0xFF  # about one 60 Hz frame period
+                if self._awaiting_name:
+                    # While naming a zone, every key goes to the prompt
+                    if key != 0xFF:
+                        self._handle_name_key(key)
+                    continue
+                handler = self._KEY_HANDLERS.get(key)
+                if handler and handler(self):
                     break
-                elif key == ord('l'):
-                    self.load_zones(self.filename)
-                    print(f"[loaded zones] {len(self.zones)} zones")
-                elif key == ord('c'):
-                    self.zones = []
-                    print("[cleared] all zones removed")
         finally:
+            grabber.stop()
             cap.release()
             cv2.destroyAllWindows()
+            self._save_queue.join()  # make sure the last drawn zone reached disk
         return True
 
 def main():
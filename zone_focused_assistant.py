@@ -2,24 +2,48 @@ import cv2
 import threading
 import time
 import os
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Iterator
 from zone_focused_detector import ZoneFocusedDetector
 from visual_memory import VisualMemory
 from ollama_client import OllamaClient
 from zone_definition_tool import ZoneDefinitionTool
 
+try:
+    import readline  # line editing and history for the REPL's input()
+except ImportError:
+    readline = None
+
+def _complete_command(text: str, state: int):
+    """readline completer over the REPL's commands"""
+    matches = [command for command in (*_COMMANDS, *_QUIT_COMMANDS) if command.startswith(text.lower())]
+    return matches[state] if state < len(matches) else None
+
+def _setup_readline():
+    """Enable history and tab completion of commands when readline is available"""
+    if readline is None:
+        return
+    readline.set_history_length(1000)
+    readline.set_completer(_complete_command)
+    # macOS ships libedit, which uses a different binding syntax
+    if "libedit" in (readline.__doc__ or ""):
+        readline.parse_and_bind("bind ^I rl_complete")
+    else:
+        readline.parse_and_bind("tab: complete")
+
 class ZoneFocusedAIHomeAssistant:
     """AI Home Assistant that only detects objects within defined zones"""
     
     def __init__(self, model_path: str = "yolo11n.pt"):
-        self.object_detector = ZoneFocusedDetector(model_path, confidence_threshold=0.15)
         self.visual_memory = VisualMemory()
+        self.object_detector = ZoneFocusedDetector(model_path, confidence_threshold=0.15,
+                                                   visual_memory=self.visual_memory)
         self.ollama_client = OllamaClient()
         self.zone_tool = ZoneDefinitionTool()
         self.is_running = False
         self.camera_thread = None
         self.zones_file = "zones.json"
         self.current_camera_index = 0
+        self.ollama_status_ttl = 5.0  # seconds a cached Ollama availability check stays valid
         
     def start(self, camera_index: int = 0):
         """Start the home assistant system"""
@@ -38,15 +62,16 @@ class ZoneFocusedAIHomeAssistant:
                 else:
                     print("⚠️  Zone definition cancelled, using full frame detection")
         
-        # Check if Ollama is available
-        if not self.ollama_client.is_available():
+        # Check if Ollama is available (always probe fresh at startup)
+        if not self.ollama_client.is_available(max_age=0):
             print("⚠️  Warning: Ollama service not available. Natural language features will be limited.")
             print("   Please make sure Ollama is running with: ollama serve")
         else:
             print("✅ Ollama service is available")
+            self.ollama_client.ensure_model()
         
         # Load and display zones
-        zones = self.visual_memory.load_custom_zones(self.zones_file)
+        zones = self._zones()
         if zones:
             print(f"📍 Loaded {len(zones)} custom zones: {[zone['name'] for zone in zones]}")
             print("🎯 Detection will ONLY happen within these zones!")
@@ -71,21 +96,26 @@ class ZoneFocusedAIHomeAssistant:
     
     def ask_question(self, question: str) -> str:
         """Ask a question about object locations with zone-focused data"""
+        return "".join(self.ask_question_stream(question))
+    
+    def ask_question_stream(self, question: str) -> Iterator[str]:
+        """Streaming variant of ask_question, yielding the answer as it is generated"""
         # Get recent detections for context (last ~5 minutes)
-        recent_detections = self.visual_memory.get_recent_detections(hours=0.08, limit=50)
+        recent_detections = self.visual_memory.get_object_context(hours=0.08, limit_objects=20)
         # If nothing recent, fall back to a longer window so we can still answer
         if not recent_detections:
-            recent_detections = self.visual_memory.get_recent_detections(hours=24, limit=200)
+            recent_detections = self.visual_memory.get_object_context(hours=24, limit_objects=20)
         
         if not recent_detections:
-            return "I don't have any detections to reference yet. Ensure the camera is running and objects are visible in your zones."
+            yield "I don't have any detections to reference yet. Ensure the camera is running and objects are visible in your zones."
+            return
         
         # Use Ollama to answer the question
-        if self.ollama_client.is_available():
-            return self.ollama_client.answer_object_question(question, recent_detections)
+        if self.ollama_client.is_available(max_age=self.ollama_status_ttl):
+            yield from self.ollama_client.answer_object_question_stream(question, recent_detections)
         else:
             # Fallback to simple text-based answers
-            return self._simple_answer(question, recent_detections)
+            yield self._simple_answer(question, recent_detections)
 
     def pause_detection(self):
         """Pause the detection loop (agent remains responsive)."""
@@ -97,16 +127,8 @@ class ZoneFocusedAIHomeAssistant:
     
     def _simple_answer(self, question: str, detections: List[Dict]) -> str:
         """Simple fallback answer when Ollama is not available"""
-        question_lower = question.lower()
-        
         # Extract object name from question
-        detected_objects = self.visual_memory.get_all_objects()
-        mentioned_object = None
-        
-        for obj in detected_objects:
-            if obj.lower() in question_lower:
-                mentioned_object = obj
-                break
+        mentioned_object = self.visual_memory.find_mentioned_object(question)
         
         if mentioned_object:
             # Get history for the mentioned object
@@ -120,17 +142,17 @@ class ZoneFocusedAIHomeAssistant:
                 return f"I don't have recent information about {mentioned_object} in your defined zones."
         else:
             # General information
-            recent_objects = list(set([d['object_name'] for d in detections]))
+            recent_objects = list(dict.fromkeys(d['object_name'] for d in detections))
             return f"I've recently detected these objects in your zones: {', '.join(recent_objects[:5])}. Ask me about any specific object!"
     
     def get_status(self) -> Dict[str, Any]:
         """Get current status of the home assistant"""
         detection_summary = self.object_detector.get_detection_summary()
-        zones = self.visual_memory.load_custom_zones(self.zones_file)
+        zones = self._zones()
         
         status = {
             'is_running': self.is_running,
-            'ollama_available': self.ollama_client.is_available(),
+            'ollama_available': self.ollama_client.is_available(max_age=self.ollama_status_ttl),
             'total_objects_detected': detection_summary['total_objects_detected'],
             'recent_detections': detection_summary['recent_detections_count'],
             'available_objects': detection_summary['objects_list'],
@@ -141,6 +163,13 @@ class ZoneFocusedAIHomeAssistant:
         
         return status
     
+    def _zones(self) -> List[Dict]:
+        """Current zones, shared with the detector (the file is only re-parsed when its mtime changes)"""
+        if self.object_detector.zones_file != self.zones_file:
+            return self.visual_memory.load_custom_zones(self.zones_file)
+        self.object_detector.load_zones_if_changed()
+        return self.object_detector.zones
+    
     def list_recent_objects(self, hours: int = 24) -> List[Dict]:
         """Get list of recently detected objects"""
         return self.visual_memory.get_recent_detections(hours=hours, limit=50)
@@ -158,17 +187,56 @@ class ZoneFocusedAIHomeAssistant:
         print("🎯 Starting zone redefinition...")
         if self.zone_tool.run(camera_index):
             print("✅ Zones redefined successfully!")
-            zones = self.visual_memory.load_custom_zones(self.zones_file)
-            print(f"📍 Current zones: {[zone['name'] for zone in zones]}")
             print("🔄 Restarting detection with new zones...")
-            # Restart detection with new zones
-            self.object_detector.load_zones()
+            # Reloads the detector's zones, so detection picks them up too
+            zones = self._zones()
+            print(f"📍 Current zones: {[zone['name'] for zone in zones]}")
         else:
             print("⚠️  Zone redefinition cancelled")
 
+def _cmd_status(assistant: ZoneFocusedAIHomeAssistant):
+    status = assistant.get_status()
+    lines = [f"📊 Status: Running={status['is_running']}, "
+             f"Ollama={status['ollama_available']}, "
+             f"Objects={status['total_objects_detected']}, "
+             f"Zones={status['custom_zones']}, "
+             f"Mode={status['detection_mode']}"]
+    if status['zone_names']:
+        lines.append(f"📍 Zones: {', '.join(status['zone_names'])}")
+    print("\n".join(lines))
+
+def _cmd_list(assistant: ZoneFocusedAIHomeAssistant):
+    recent = assistant.list_recent_objects()
+    if recent:
+        # Format the whole listing first so it goes out in a single write
+        print("📋 Recent detections in zones:\n" + "\n".join(
+            f"  - {det['object_name']} in {det.get('location_description', 'unknown zone')} at {det['timestamp']}"
+            for det in recent[:10]))
+    else:
+        print("No recent detections found in your zones.")
+
+def _cmd_pause(assistant: ZoneFocusedAIHomeAssistant):
+    assistant.pause_detection()
+    print("⏸️ Detection paused. You can still ask questions.")
+
+def _cmd_resume(assistant: ZoneFocusedAIHomeAssistant):
+    assistant.resume_detection()
+    print("▶️ Detection resumed.")
+
+# REPL commands (lower-case input -> handler); anything else is treated as a question
+_COMMANDS = {
+    'status': _cmd_status,
+    'list': _cmd_list,
+    'zones': ZoneFocusedAIHomeAssistant.redefine_zones,
+    'pause': _cmd_pause,
+    'resume': _cmd_resume,
+}
+_QUIT_COMMANDS = ('quit', 'exit', 'stop')
+
 def main():
     """Main function to run the zone-focused home assistant"""
     assistant = ZoneFocusedAIHomeAssistant()
+    _setup_readline()
     
     try:
         # Start the assistant
@@ -194,37 +262,18 @@ def main():
         while assistant.is_running:
             try:
                 user_input = input("\n🤖 You: ").strip()
+                command = user_input.lower()
                 
-                if user_input.lower() in ['quit', 'exit', 'stop']:
+                if command in _QUIT_COMMANDS:
                     break
-                elif user_input.lower() == 'status':
-                    status = assistant.get_status()
-                    print(f"📊 Status: Running={status['is_running']}, "
-                          f"Ollama={status['ollama_available']}, "
-                          f"Objects={status['total_objects_detected']}, "
-                          f"Zones={status['custom_zones']}, "
-                          f"Mode={status['detection_mode']}")
-                    if status['zone_names']:
-                        print(f"📍 Zones: {', '.join(status['zone_names'])}")
-                elif user_input.lower() == 'list':
-                    recent = assistant.list_recent_objects()
-                    if recent:
-                        print("📋 Recent detections in zones:")
-                        for det in recent[:10]:
-                            print(f"  - {det['object_name']} in {det.get('location_description', 'unknown zone')} at {det['timestamp']}")
-                    else:
-                        print("No recent detections found in your zones.")
-                elif user_input.lower() == 'zones':
-                    assistant.redefine_zones()
-                elif user_input.lower() == 'pause':
-                    assistant.pause_detection()
-                    print("⏸️ Detection paused. You can still ask questions.")
-                elif user_input.lower() == 'resume':
-                    assistant.resume_detection()
-                    print("▶️ Detection resumed.")
+                handler = _COMMANDS.get(command)
+                if handler:
+                    handler(assistant)
                 elif user_input:
-                    answer = assistant.ask_question(user_input)
-                    print(f"🤖 Assistant: {answer}")
+                    print("🤖 Assistant: ", end="", flush=True)
+                    for chunk in assistant.ask_question_stream(user_input):
+                        print(chunk, end="", flush=True)
+                    print()
                     
             except KeyboardInterrupt:
                 break
@@ -1,9 +1,14 @@
 import cv2
+import functools
 import numpy as np
-from ultralytics import YOLO
+import queue
+import torch
+from model_loader import load_yolo_model
 import threading
-from typing import List, Tuple, Dict, Any
+from typing import List, Tuple, Dict, Any, NamedTuple, Optional
 from visual_memory import VisualMemory
+from camera import FrameGrabber, open_camera, put_drop_oldest
+from zone_kernels import assign_zones, warmup as warmup_zone_kernels
 import time
 import json
 import os
@@ -12,36 +17,170 @@ import time
 # ensure visual memory helper available
 from visual_memory import append_detection
 
+# One row per detection, box as (x, y, width, height) in frame pixels; zone is an index
+# into the detector's zones, or -1 for full-frame detections
+DET_DTYPE = np.dtype([('cls', np.int32), ('conf', np.float32), ('x', np.float32), ('y', np.float32),
+                      ('w', np.float32), ('h', np.float32), ('zone', np.int32)])
+
+def _make_detections(xyxy: np.ndarray, confs: np.ndarray, class_ids: np.ndarray, zone: int) -> np.recarray:
+    """Pack x1, y1, x2, y2 boxes, confidences and class ids of one zone into a DET_DTYPE array"""
+    dets = np.empty(len(confs), dtype=DET_DTYPE).view(np.recarray)
+    dets.cls = class_ids
+    dets.conf = confs
+    dets.x = xyxy[:, 0]
+    dets.y = xyxy[:, 1]
+    dets.w = xyxy[:, 2] - xyxy[:, 0]
+    dets.h = xyxy[:, 3] - xyxy[:, 1]
+    dets.zone = zone
+    return dets
+
+_NO_DETECTIONS = np.empty(0, dtype=DET_DTYPE).view(np.recarray)
+
+def _compile_model(model, device, batch_size: int, imgsz: int):
+    """torch.compile the predictor's PyTorch network into CUDA graphs, keeping it eager if that fails"""
+    backend = getattr(getattr(model, "predictor", None), "model", None)
+    network = getattr(backend, "model", None)
+    if device == 'cpu' or not hasattr(torch, "compile") or not isinstance(network, torch.nn.Module):
+        return  # TensorRT and ONNX backends are compiled graphs already
+    try:
+        backend.model = torch.compile(network, mode="reduce-overhead", fullgraph=False)
+        # Capture a full batch of zone crops now; other batch sizes are captured when they first occur
+        with torch.inference_mode():
+            model.predict([np.zeros((imgsz, imgsz, 3), dtype=np.uint8)] * batch_size, imgsz=imgsz,
+                          half=True, device=device, verbose=False)
+    except Exception as e:
+        backend.model = network
+        print(f"⚠️  torch.compile failed, running the model eagerly: {e}")
+
+@functools.lru_cache(maxsize=4)
+def _load_model(model_path: str, device, batch_size: int, warmup_imgsz: int, int8: bool,
+                calib_data: str, cpu_int8: bool, compile_model: bool = False):
+    """Load and warm up a zone model once per process; detectors with the same settings share it"""
+    model = load_yolo_model(model_path, batch_size=batch_size, imgsz=640,
+                            int8=int8, calib_data=calib_data, cpu_int8=cpu_int8)
+    # The first call pays for predictor setup and cuDNN autotuning, so make it here, not on a camera frame
+    with torch.inference_mode():
+        model.predict(np.zeros((warmup_imgsz, warmup_imgsz, 3), dtype=np.uint8), imgsz=warmup_imgsz,
+                      half=device != 'cpu', device=device, verbose=False)
+    if compile_model:
+        _compile_model(model, device, batch_size, warmup_imgsz)
+    return model
+
+class ZoneSet(NamedTuple):
+    """Immutable snapshot of the loaded zones; a reload swaps in a new one instead of editing it in place"""
+    zones: List[Dict]
+    rects: List[Tuple[int, int, int, int]]  # integer (x, y, w, h) per zone
+    # Zone corners with the right/bottom edges precomputed, for vectorized point-in-zone tests
+    x1: np.ndarray
+    y1: np.ndarray
+    x2: np.ndarray
+    y2: np.ndarray
+    names: np.ndarray
+    version: int  # bumped whenever zones are reloaded
+    
+    @classmethod
+    def build(cls, zones: List[Dict], version: int) -> "ZoneSet":
+        """Precompute per-zone crop rects and coordinate columns"""
+        boxes = np.array([zone["bbox"] for zone in zones], dtype=np.float32).reshape(-1, 4)
+        x1 = np.ascontiguousarray(boxes[:, 0])
+        y1 = np.ascontiguousarray(boxes[:, 1])
+        return cls(zones, [tuple(int(round(v)) for v in zone["bbox"]) for zone in zones],
+                   x1, y1, x1 + boxes[:, 2], y1 + boxes[:, 3],
+                   np.array([zone["name"] for zone in zones], dtype=object), version)
+
+@functools.lru_cache(maxsize=1024)
+def _label_size(class_name: str, zone_name: str) -> Tuple[int, int]:
+    """(width, height) of a detection label; Hershey digits share one width, so any confidence fits"""
+    return cv2.getTextSize(f"{class_name}: 0.00 ({zone_name})", cv2.FONT_HERSHEY_SIMPLEX, 0.5, 2)[0]
+
 class ZoneFocusedDetector:
     """Object detector that only detects objects within defined zones"""
     
-    def __init__(self, model_path: str = "yolo11n.pt", confidence_threshold: float = 0.15, zones_file: str = "zones.json"):
-        self.model = YOLO(model_path)
+    def __init__(self, model_path: str = "yolo11n.pt", confidence_threshold: float = 0.15, zones_file: str = "zones.json",
+                 visual_memory: VisualMemory = None, int8: bool = False, calib_data: str = None,
+                 cpu_int8: Optional[bool] = None, compile_model: bool = False):
+        self.zone_imgsz = 320  # zone crops are small, so infer them at a reduced size
+        # Full-frame fallback frames are downscaled to this longest side before inference (None
+        # keeps full resolution); boxes are scaled back to camera pixels. Zone crops are always
+        # cut from the full-resolution frame so small objects keep their detail
+        self.inference_size = 640
+        self.max_batch = 8  # most zone crops per model call (the TensorRT engine's batch limit)
+        # Micro-batch consecutive frames on the GPU; on CPU batching adds latency without a throughput win
+        self.frames_per_batch = 4 if torch.cuda.is_available() else 1
+        self.batch_timeout = 0.033  # never hold a frame back longer than about one frame period
+        use_cuda = torch.cuda.is_available()
+        device = 0 if use_cuda else 'cpu'
+        # TensorRT engine (FP16, or INT8 calibrated on calib_data, a folder of camera frames) when
+        # CUDA is available. On CPU-only machines, INT8 ONNX Runtime when cpu_int8 is set; by default
+        # only when calib_data is given, since uncalibrated dynamic quantization costs accuracy.
+        # The shape range is built up to 640 so the full-frame fallback fits as well as the 320
+        # zone crops. Cached, so re-creating a detector is free (instances share the model and
+        # should not run detection concurrently).
+        # compile_model=True additionally runs a PyTorch model through torch.compile on CUDA
+        if cpu_int8 is None:
+            cpu_int8 = calib_data is not None
+        self.model = _load_model(model_path, device, self.max_batch, self.zone_imgsz,
+                                 int8, calib_data, cpu_int8, compile_model)
+        # Fixed predictor settings so Ultralytics doesn't re-derive them on every call
+        self._predict_kwargs = dict(half=use_cuda, device=device, augment=False, verbose=False)
         self.confidence_threshold = confidence_threshold
-        self.visual_memory = VisualMemory()
+        # Share the caller's memory so zone/object caches and the DB connection exist once
+        self.visual_memory = visual_memory if visual_memory is not None else VisualMemory()
         self.is_detecting = False
         self.detection_thread = None
         self.zones_file = zones_file
         self._zones_mtime = 0
-        self.zones = []
+        # Zones may be reloaded from another thread (e.g. the assistant's REPL), so readers take
+        # self.zone_set once and use that snapshot throughout
+        self.zone_set = ZoneSet.build([], 0)
+        self._zones_lock = threading.Lock()
+        # Per-zone motion gate: zones whose 32x32 grayscale ROI barely changed since they were
+        # last inferred reuse those detections instead of going through the model again
+        self.skip_static_zones = True
+        self.zone_motion_threshold = 3.0  # mean absolute difference, in gray levels
+        self.static_refresh_seconds = 5.0  # still re-run inference this often on a static zone
+        # (only touched by the thread running detection, reset there when the zone set changes)
+        self._prev_roi: Dict[int, np.ndarray] = {}
+        self._zone_cache: Dict[int, np.recarray] = {}
+        self._zone_inferred_at: Dict[int, float] = {}
+        self._cache_version = 0
+        # Zone rectangles and labels are rendered once into an overlay and blended in per frame
+        self._zone_overlay_key = None
+        self._zone_overlay_idx = None
+        self._zone_overlay_alpha = None
+        self._zone_overlay_px = None
         self.load_zones_if_changed()
+        # JIT-compile (or load the cached) point-in-zone kernel before the first frame
+        warmup_zone_kernels()
+        self.display_fps = 15.0  # annotate and show at most this many frames per second
+        self.camera_resolution = None  # (width, height) to request from the camera, None keeps its default
+        self.camera_fps = None
         self.frame_width = 640
         self.frame_skip = 2
         self._frame_count = 0
         self.label_map = {"mug": "cup", "water_bottle": "bottle"}  # add mappings as needed
         
+    @property
+    def zones(self) -> List[Dict]:
+        """Currently loaded zones"""
+        return self.zone_set.zones
+    
     def load_zones_if_changed(self):
-        """Load custom zones from JSON file if it has changed"""
-        try:
-            if os.path.exists(self.zones_file):
-                m = os.path.getmtime(self.zones_file)
+        """Load custom zones from JSON file if it has changed (safe to call from any thread)"""
+        with self._zones_lock:
+            try:
+                m = os.stat(self.zones_file).st_mtime  # one syscall; unchanged files cost nothing more
                 if m != self._zones_mtime:
                     with open(self.zones_file, "r", encoding="utf-8") as f:
-                        self.zones = json.load(f)
+                        zones = json.load(f)
+                    # One reference assignment, so the detection thread sees the old set or the new one
+                    self.zone_set = ZoneSet.build(zones, self.zone_set.version + 1)
                     self._zones_mtime = m
-                    print(f"[zones reloaded] {len(self.zones)} zones")
-        except Exception as e:
-            print("Error reloading zones:", e)
+                    print(f"[zones reloaded] {len(zones)} zones")
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                print("Error reloading zones:", e)
 
     def load_zones(self) -> bool:
         """Backward-compatible wrapper used by callers expecting load_zones().
@@ -52,6 +191,20 @@ class ZoneFocusedDetector:
         self.load_zones_if_changed()
         return len(self.zones) > 0
     
+    def _sync_zone_caches(self, zone_set: ZoneSet):
+        """Drop motion-gate state from an older zone set (its indices may mean different rectangles)"""
+        if zone_set.version != self._cache_version:
+            self._prev_roi.clear()
+            self._zone_cache.clear()
+            self._zone_inferred_at.clear()
+            self._cache_version = zone_set.version
+    
+    def zone_indices_for_points(self, cx: np.ndarray, cy: np.ndarray, zone_set: ZoneSet = None) -> np.ndarray:
+        """Index of the first zone containing each point (edges inclusive), or -1"""
+        zs = zone_set or self.zone_set
+        # Compiled loop when numba is installed, NumPy broadcast otherwise
+        return assign_zones(cx, cy, zs.x1, zs.y1, zs.x2, zs.y2)
+    
     def is_point_in_zone(self, point: Tuple[float, float], zone: Dict) -> bool:
         """Check if a point is within a zone"""
         x, y = point
@@ -62,117 +215,217 @@ class ZoneFocusedDetector:
     
     def get_zone_for_point(self, point: Tuple[float, float]) -> str:
         """Get zone name for a given point"""
-        for zone in self.zones:
-            if self.is_point_in_zone(point, zone):
-                return zone["name"]
-        return "outside_zones"
+        x, y = point
+        zs = self.zone_set
+        mask = (zs.x1 <= x) & (x <= zs.x2) & (zs.y1 <= y) & (y <= zs.y2)
+        if not mask.any():
+            return "outside_zones"
+        return zs.names[np.argmax(mask)]
+    
+    def zone_name(self, zone_index: int, zone_set: ZoneSet = None) -> str:
+        """Name of a zone index from a detection array ('full_frame' for -1)"""
+        return (zone_set or self.zone_set).names[zone_index] if zone_index >= 0 else 'full_frame'
+    
+    def detections_to_dicts(self, detections: np.recarray, zone_set: ZoneSet = None) -> List[Dict[str, Any]]:
+        """Detection dicts (class_name, confidence, bbox, class_id, zone_name) for callers that want them
+
+        Pass the zone_set the detections were made with if zones may have been reloaded since.
+        """
+        zone_set = zone_set or self.zone_set
+        return [{
+            'class_name': self.model.names[class_id],
+            'confidence': confidence,
+            'bbox': (x, y, w, h),
+            'class_id': class_id,
+            'zone_name': self.zone_name(zone, zone_set)
+        } for class_id, confidence, x, y, w, h, zone in detections.tolist()]
     
-    def detect_objects_in_zones(self, frame: np.ndarray) -> List[Dict[str, Any]]:
-        """Detect objects only within defined zones"""
-        if not self.zones:
+    def detect_objects_in_zones(self, frame: np.ndarray) -> np.recarray:
+        """Detect objects only within defined zones (a DET_DTYPE record array)"""
+        return self.detect_objects_in_zones_batch([frame])[0]
+    
+    def detect_objects_in_zones_batch(self, frames: List[np.ndarray],
+                                      zone_set: ZoneSet = None) -> List[np.recarray]:
+        """Zone detections for several frames, with all their zone crops sent through the model together
+
+        zone indices in the result refer to zone_set (default: the zones loaded right now).
+        """
+        zs = zone_set or self.zone_set
+        if not zs.zones:
             print("⚠️  No zones loaded, using full frame detection")
-            return self.detect_objects_full_frame(frame)
+            return self.detect_objects_full_frame_batch(frames)
+        self._sync_zone_caches(zs)
         
-        results = self.model(frame, conf=self.confidence_threshold)
-        zone_detections = []
+        # Crop every zone (clipped to the frame) of every frame; static zones reuse their last detections
+        crops, crop_zones, thumbs, plan = [], [], [], []
+        pending: Dict[int, np.ndarray] = {}
+        now = time.monotonic()
+        for frame_index, frame in enumerate(frames):
+            frame_h, frame_w = frame.shape[:2]
+            for i, (x, y, w, h) in enumerate(zs.rects):
+                x0, y0 = max(x, 0), max(y, 0)
+                x1, y1 = min(x + w, frame_w), min(y + h, frame_h)
+                if x1 <= x0 or y1 <= y0:
+                    continue
+                crop = frame[y0:y1, x0:x1]
+                thumb = None
+                if self.skip_static_zones:
+                    thumb = self._zone_changed(i, crop, now, pending)
+                    if thumb is None:
+                        plan.append((frame_index, i, None))
+                        continue
+                    pending[i] = thumb
+                plan.append((frame_index, i, len(crops)))
+                crops.append(crop)
+                crop_zones.append((i, x0, y0))
+                thumbs.append(thumb)
         
-        for result in results:
-            boxes = result.boxes
-            if boxes is not None:
-                for box in boxes:
-                    # Get bounding box coordinates
-                    x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
-                    confidence = box.conf[0].cpu().numpy()
-                    class_id = int(box.cls[0].cpu().numpy())
-                    class_name = self.model.names[class_id]
-                    
-                    # Calculate object center point
-                    center_x = (x1 + x2) / 2
-                    center_y = (y1 + y2) / 2
-                    
-                    # Check if object center is in any zone
-                    zone_name = self.get_zone_for_point((center_x, center_y))
-                    
-                    if zone_name != "outside_zones":
-                        # Convert to (x, y, width, height) format
-                        x, y, w, h = x1, y1, x2-x1, y2-y1
-                        
-                        detection = {
-                            'class_name': class_name,
-                            'confidence': float(confidence),
-                            'bbox': (x, y, w, h),
-                            'class_id': class_id,
-                            'zone_name': zone_name
-                        }
-                        zone_detections.append(detection)
+        # Ultralytics letterboxes each crop and maps boxes back to crop coordinates
+        crop_detections = [self._zone_detections(data, zs, *crop_zone) for data, crop_zone in
+                           zip(self._results_to_numpy(self._predict(crops, imgsz=self.zone_imgsz)), crop_zones)]
+        
+        # In frame order, so a static zone repeats what its latest inferred crop found
+        zone_detections = [[] for _ in frames]
+        for frame_index, zone_index, crop_index in plan:
+            if crop_index is not None:
+                self._zone_cache[zone_index] = crop_detections[crop_index]
+                # Gate state only moves once inference succeeded; a failed batch is retried next time
+                if thumbs[crop_index] is not None:
+                    self._prev_roi[zone_index] = thumbs[crop_index]
+                    self._zone_inferred_at[zone_index] = now
+            if zone_index in self._zone_cache:
+                zone_detections[frame_index].append(self._zone_cache[zone_index])
+        
+        return [np.concatenate(parts).view(np.recarray) if parts else _NO_DETECTIONS
+                for parts in zone_detections]
+    
+    def _downscale(self, frame: np.ndarray) -> Tuple[np.ndarray, float]:
+        """Frame shrunk to inference_size on its longest side, and the scale applied"""
+        longest = max(frame.shape[:2])
+        if not self.inference_size or longest <= self.inference_size:
+            return frame, 1.0
+        # The model letterboxes the full frame to 640 anyway; shrinking first moves far fewer
+        # bytes through preprocessing
+        scale = self.inference_size / longest
+        size = (int(frame.shape[1] * scale), int(frame.shape[0] * scale))
+        return cv2.resize(frame, size, interpolation=cv2.INTER_AREA), scale
+    
+    def _zone_changed(self, zone_index: int, crop: np.ndarray, now: float,
+                      pending: Dict[int, np.ndarray]) -> Optional[np.ndarray]:
+        """Motion gate: the zone's thumbnail when it needs inference, or None when it is unchanged since it was last inferred
+
+        pending holds the thumbnails of zones already queued for inference in this batch.
+        """
+        small = cv2.resize(cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY), (32, 32), interpolation=cv2.INTER_AREA)
+        # Compare against the ROI at its last inference, so slow drift still adds up to a change
+        if zone_index in pending:
+            previous, inferred_at = pending[zone_index], now
+        else:
+            previous, inferred_at = self._prev_roi.get(zone_index), self._zone_inferred_at.get(zone_index, 0.0)
+        if (previous is not None and
+                cv2.absdiff(small, previous).mean() <= self.zone_motion_threshold and
+                now - inferred_at < self.static_refresh_seconds):
+            return None
+        return small
+    
+    def _zone_detections(self, data: np.ndarray, zone_set: ZoneSet, zone_index: int,
+                         off_x: int, off_y: int) -> np.recarray:
+        """Detections of one zone crop, in frame coordinates"""
+        if not len(data):
+            return _NO_DETECTIONS
+        xyxy = data[:, :4] + np.array([off_x, off_y, off_x, off_y], dtype=np.float32)
         
-        return zone_detections
+        # Overlapping zones see the same object; keep it only for the first zone containing its center
+        first_zone = self.zone_indices_for_points((xyxy[:, 0] + xyxy[:, 2]) / 2, (xyxy[:, 1] + xyxy[:, 3]) / 2,
+                                                  zone_set)
+        keep = first_zone == zone_index
+        return _make_detections(xyxy[keep], data[keep, 4], data[keep, 5], zone_index)
     
-    def detect_objects_full_frame(self, frame: np.ndarray) -> List[Dict[str, Any]]:
+    @staticmethod
+    def _results_to_numpy(results) -> List[np.ndarray]:
+        """(N, 6) x1, y1, x2, y2, conf, cls array per result, pulled to the host in one transfer"""
+        datas = [result.boxes.data if result.boxes is not None else None for result in results]
+        counts = [len(data) if data is not None else 0 for data in datas]
+        if not sum(counts):
+            return [np.empty((0, 6), np.float32) for _ in results]
+        # One device->host copy (and sync) for the whole batch instead of one per box and field
+        merged = torch.cat([data[:, :6] for data in datas if data is not None and len(data)]).cpu().numpy()
+        return np.split(merged, np.cumsum(counts)[:-1])
+    
+    def _predict(self, images: List[np.ndarray], **kwargs) -> list:
+        """Run the model on images in chunks of at most max_batch, returning one Results per image"""
+        kwargs = {**self._predict_kwargs, **kwargs}
+        results = []
+        # Stricter (and cheaper) than the no_grad Ultralytics applies on its own
+        with torch.inference_mode():
+            for start in range(0, len(images), self.max_batch):
+                results.extend(self.model.predict(images[start:start + self.max_batch],
+                                                  conf=self.confidence_threshold, **kwargs))
+        return results
+    
+    def detect_objects_full_frame(self, frame: np.ndarray) -> np.recarray:
         """Fallback: detect objects in full frame if no zones"""
-        results = self.model(frame, conf=self.confidence_threshold)
-        detections = []
+        return self.detect_objects_full_frame_batch([frame])[0]
+    
+    def detect_objects_full_frame_batch(self, frames: List[np.ndarray]) -> List[np.recarray]:
+        """Full-frame fallback for several frames in one batched call"""
+        all_detections = []
+        smalls, scales = zip(*(self._downscale(frame) for frame in frames)) if frames else ((), ())
         
-        for result in results:
-            boxes = result.boxes
-            if boxes is not None:
-                for box in boxes:
-                    x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
-                    confidence = box.conf[0].cpu().numpy()
-                    class_id = int(box.cls[0].cpu().numpy())
-                    class_name = self.model.names[class_id]
-                    
-                    x, y, w, h = x1, y1, x2-x1, y2-y1
-                    
-                    detection = {
-                        'class_name': class_name,
-                        'confidence': float(confidence),
-                        'bbox': (x, y, w, h),
-                        'class_id': class_id,
-                        'zone_name': 'full_frame'
-                    }
-                    detections.append(detection)
+        for data, scale in zip(self._results_to_numpy(self._predict(list(smalls), imgsz=640)), scales):
+            if scale != 1.0:
+                data[:, :4] /= scale
+            all_detections.append(_make_detections(data[:, :4], data[:, 4], data[:, 5], -1))
         
-        return detections
+        return all_detections
     
-    def draw_detections(self, frame: np.ndarray, detections: List[Dict]) -> np.ndarray:
-        """Draw bounding boxes and labels on frame"""
-        frame_copy = frame.copy()
+    def draw_detections(self, frame: np.ndarray, detections: np.recarray, inplace: bool = True,
+                        zone_set: ZoneSet = None) -> np.ndarray:
+        """Draw bounding boxes and labels on frame (in place unless inplace=False; don't reuse the raw frame after)"""
+        zs = zone_set or self.zone_set
+        # Annotated frames are handed to the display thread, so a copy can't be a reused buffer
+        frame_copy = frame if inplace else frame.copy()
         
-        # Draw zones first
-        for zone in self.zones:
-            x, y, w, h = zone["bbox"]
-            name = zone["name"]
-            
-            # Draw zone rectangle (blue)
-            cv2.rectangle(frame_copy, (int(x), int(y)), 
-                         (int(x + w), int(y + h)), (255, 0, 0), 2)
-            
-            # Draw zone label
-            cv2.putText(frame_copy, f"Zone: {name}", (int(x), int(y) - 10),
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 0, 0), 2)
+        # Draw zones first, blended from the cached overlay (only the pixels it covers)
+        key = (frame.shape, zs.version)
+        if key != self._zone_overlay_key:
+            self._build_zone_overlay(frame.shape, zs.zones)
+            self._zone_overlay_key = key
+        ys, xs = self._zone_overlay_idx
+        frame_copy[ys, xs] = frame_copy[ys, xs] * (1 - self._zone_overlay_alpha) + self._zone_overlay_px
         
         # Draw object detections
-        for detection in detections:
-            x, y, w, h = detection['bbox']
-            class_name = detection['class_name']
-            confidence = detection['confidence']
-            zone_name = detection.get('zone_name', 'unknown')
+        for class_id, confidence, x, y, w, h, zone in detections.tolist():
+            x1, y1, x2, y2 = int(x), int(y), int(x + w), int(y + h)
+            class_name = self.model.names[class_id]
+            zone_name = self.zone_name(zone, zs)
             
-            # Draw bounding box (green for zone objects)
-            cv2.rectangle(frame_copy, (int(x), int(y)), 
-                         (int(x + w), int(y + h)), (0, 255, 0), 2)
+            # Draw bounding box (green for zone objects); LINE_4 is cheaper than the default LINE_8
+            cv2.rectangle(frame_copy, (x1, y1), (x2, y2), (0, 255, 0), 2, cv2.LINE_4)
             
             # Draw label with zone info
-            label = f"{class_name}: {confidence:.2f} ({zone_name})"
-            label_size = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 2)[0]
-            cv2.rectangle(frame_copy, (int(x), int(y) - label_size[1] - 10),
-                         (int(x) + label_size[0], int(y)), (0, 255, 0), -1)
-            cv2.putText(frame_copy, label, (int(x), int(y) - 5),
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0), 2)
+            label_w, label_h = _label_size(class_name, zone_name)
+            cv2.rectangle(frame_copy, (x1, y1 - label_h - 10), (x1 + label_w, y1), (0, 255, 0), -1)
+            cv2.putText(frame_copy, f"{class_name}: {confidence:.2f} ({zone_name})", (x1, y1 - 5),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0), 2, cv2.LINE_4)
         
         return frame_copy
     
+    def _build_zone_overlay(self, shape, zones: List[Dict]):
+        """Render zone rectangles and labels once: covered pixel indices, their coverage and premultiplied color"""
+        overlay = np.zeros(shape, dtype=np.uint8)
+        coverage = np.zeros(shape[:2], dtype=np.uint8)  # same strokes in white, for anti-aliased edges
+        for zone in zones:
+            x, y, w, h = zone["bbox"]
+            for img, color in ((overlay, (255, 0, 0)), (coverage, 255)):
+                # Draw zone rectangle (blue) and label
+                cv2.rectangle(img, (int(x), int(y)), (int(x + w), int(y + h)), color, 2)
+                cv2.putText(img, f"Zone: {zone['name']}", (int(x), int(y) - 10),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
+        self._zone_overlay_idx = np.nonzero(coverage)
+        self._zone_overlay_alpha = (coverage[self._zone_overlay_idx] / 255.0).astype(np.float32)[:, None]
+        self._zone_overlay_px = overlay[self._zone_overlay_idx].astype(np.float32)
+    
     def start_continuous_detection(self, camera_index: int = 0, save_interval: int = 1):
         """Start continuous object detection from camera"""
         # Load zones first
@@ -191,67 +444,126 @@ class ZoneFocusedDetector:
         self.is_detecting = False
         if self.detection_thread:
             self.detection_thread.join()
+        self.visual_memory.flush()
     
     def _detection_loop(self, camera_index: int, save_interval: int):
         """Main detection loop running in separate thread"""
-        cap = cv2.VideoCapture(camera_index)
+        cap = open_camera(camera_index, *(self.camera_resolution or (None, None)), fps=self.camera_fps)
         
         if not cap.isOpened():
             print(f"❌ Error: Could not open camera {camera_index}")
             return
         
+        # Pipeline: grabber thread reads frames, this thread infers, display thread shows them and
+        # saver thread writes them to memory, so reading frame N+1 and showing/saving frame N-1
+        # overlap inference on frame N
+        grabber = FrameGrabber(cap).start()
+        display_q = queue.Queue(maxsize=4)
+        display_thread = threading.Thread(target=self._display_loop, args=(display_q,), daemon=True)
+        display_thread.start()
+        save_q = queue.Queue(maxsize=32)
+        saver_thread = threading.Thread(target=self._saver_loop, args=(save_q,), daemon=True)
+        saver_thread.start()
         frame_count = 0
+        last_show = 0.0
+        frames = []
+        deadline = 0.0
         
         try:
             while self.is_detecting:
-                ret, frame = cap.read()
-                if not ret:
-                    print("❌ Error: Could not read frame from camera")
-                    break
-                
-                # Detect objects in zones only
-                detections = self.detect_objects_in_zones(frame)
-                
-                # Draw detections on frame
-                frame_with_detections = self.draw_detections(frame, detections)
-                
-                # Add status info
-                cv2.putText(frame_with_detections, f"Zone-Focused Detection: {len(detections)} objects", 
-                           (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
-                cv2.putText(frame_with_detections, f"Zones: {len(self.zones)}", 
-                           (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
-                
-                # Display frame
-                cv2.imshow('Zone-Focused AI Home Assistant', frame_with_detections)
-                
-                # Save detections to memory
-                if frame_count % save_interval == 0 and detections:
-                    self._save_detections_to_memory(detections, frame.shape[:2])
-                    print(f"📝 Saved {len(detections)} zone detections to memory")
+                # Collect up to frames_per_batch frames, or whatever arrived within batch_timeout
+                timeout = max(deadline - time.monotonic(), 0.0) if frames else 0.5
+                frame = grabber.read(timeout=timeout)
+                if frame is None:
+                    if grabber.failed:
+                        print("❌ Error: Could not read frame from camera")
+                        break
+                    if not frames:
+                        continue
+                else:
+                    if not frames:
+                        deadline = time.monotonic() + self.batch_timeout
+                    frames.append(frame)
+                    if len(frames) < self.frames_per_batch and time.monotonic() < deadline:
+                        continue
                 
-                frame_count += 1
+                # Detect objects in zones only, one model pass for the whole micro-batch; one zone
+                # snapshot for the batch, even if the zones are reloaded meanwhile
+                zone_set = self.zone_set
+                batch_detections = self.detect_objects_in_zones_batch(frames, zone_set)
                 
-                # Check for exit key
-                if cv2.waitKey(1) & 0xFF == ord('q'):
-                    break
+                for frame, detections in zip(frames, batch_detections):
+                    # Only annotate frames that will actually be shown (display is capped at display_fps)
+                    now = time.monotonic()
+                    if now - last_show >= 1.0 / self.display_fps:
+                        last_show = now
+                        # Draw detections on frame (frames come fresh from the grabber, so in place)
+                        frame_with_detections = self.draw_detections(frame, detections, zone_set=zone_set)
+                        
+                        # Add status info
+                        cv2.putText(frame_with_detections, f"Zone-Focused Detection: {len(detections)} objects", 
+                                   (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+                        cv2.putText(frame_with_detections, f"Zones: {len(zone_set.zones)}", 
+                                   (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+                        
+                        # Hand off for display; a slow window drops old frames instead of lagging behind
+                        put_drop_oldest(display_q, frame_with_detections)
+                    
+                    # Save detections to memory; if the writer falls behind, the oldest pending save is dropped
+                    if frame_count % save_interval == 0 and len(detections):
+                        # (with the zone names the indices refer to; zones may be reloaded before it is written)
+                        put_drop_oldest(save_q, (detections, (frame.shape[1], frame.shape[0]), zone_set.names))
+                    
+                    frame_count += 1
+                frames = []
                     
         finally:
+            grabber.stop()
             cap.release()
+            put_drop_oldest(display_q, None)
+            display_thread.join()
+            save_q.put(None)  # blocking, so saves still queued are written before the saver exits
+            saver_thread.join()
+    
+    def _display_loop(self, display_q: queue.Queue):
+        """Display thread: show annotated frames and stop detection when 'q' is pressed"""
+        try:
+            while True:
+                try:
+                    frame = display_q.get(timeout=0.05)
+                    if frame is None:
+                        break
+                    cv2.imshow('Zone-Focused AI Home Assistant', frame)
+                except queue.Empty:
+                    pass  # nothing new to show, but keep the window and 'q' responsive
+                # Check for exit key
+                if cv2.waitKey(1) & 0xFF == ord('q'):
+                    self.is_detecting = False
+        finally:
             cv2.destroyAllWindows()
     
-    def _save_detections_to_memory(self, detections: List[Dict], frame_size: Tuple[int, int]):
-        """Save detections to visual memory with zone information"""
-        for detection in detections:
-            bbox = detection['bbox']
-            zone_name = detection.get('zone_name', 'unknown_zone')
-            
-            self.visual_memory.add_detection(
-                object_name=detection['class_name'],
-                confidence=detection['confidence'],
-                bbox=bbox,
-                frame_size=frame_size,
-                location_description=zone_name
-            )
+    def _saver_loop(self, save_q: queue.Queue):
+        """Saver thread: write queued (detections, frame_size, zone_names) entries to visual memory"""
+        while True:
+            item = save_q.get()
+            if item is None:
+                break
+            detections, frame_size, zone_names = item
+            try:
+                self._save_detections_to_memory(detections, frame_size, zone_names)
+                print(f"📝 Saved {len(detections)} zone detections to memory")
+            except Exception as e:
+                print(f"❌ Error saving detections: {e}")
+    
+    def _save_detections_to_memory(self, detections: np.recarray, frame_size: Tuple[int, int],
+                                   zone_names: np.ndarray = None):
+        """Save detections to visual memory with zone information (one bulk insert per frame)
+
+        zone_names must be those of the zone set the detections were made with (default: current zones).
+        """
+        if zone_names is None:
+            zone_names = self.zone_set.names
+        self.visual_memory.add_detections_arr(detections, zone_names, self.model.names, frame_size)
     
     def get_detection_summary(self) -> Dict[str, Any]:
         """Get summary of recent detections"""
@@ -262,7 +574,7 @@ class ZoneFocusedDetector:
             'total_objects_detected': len(all_objects),
             'recent_detections_count': len(recent_detections),
             'objects_list': all_objects,
-            'recent_objects': list(set([d['object_name'] for d in recent_detections])),
+            'recent_objects': list(dict.fromkeys(d['object_name'] for d in recent_detections)),
             'zones_count': len(self.zones),
             'zone_names': [zone['name'] for zone in self.zones]
         }
@@ -0,0 +1,58 @@
+import threading
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+def _prepare(cx, cy, x0, y0, x1, y1):
+    """Contiguous float32 points and zone columns, so the JIT kernel compiles one signature"""
+    return [np.ascontiguousarray(a, dtype=np.float32).ravel() for a in (cx, cy, x0, y0, x1, y1)]
+
+_scratch_local = threading.local()
+
+def _scratch(rows: int, cols: int):
+    """Two reusable (rows, cols) bool buffers for the NumPy fallback, one pair per thread"""
+    buffers = getattr(_scratch_local, "buffers", None)
+    if buffers is None or buffers[0].shape[0] < rows or buffers[0].shape[1] != cols:
+        buffers = _scratch_local.buffers = (np.empty((max(rows, 64), cols), np.bool_),
+                                            np.empty((max(rows, 64), cols), np.bool_))
+    return buffers[0][:rows], buffers[1][:rows]
+
+def _assign_zones_numpy(cx, cy, x0, y0, x1, y1) -> np.ndarray:
+    """NumPy fallback: branchless (N, Z) containment matrix, first matching zone per point"""
+    # Comparisons written into preallocated buffers, so no temporaries beyond the result
+    inside, edge = _scratch(cx.size, x0.size)
+    cx, cy = cx[:, None], cy[:, None]
+    np.less_equal(x0, cx, out=inside)
+    inside &= np.less_equal(cx, x1, out=edge)
+    inside &= np.less_equal(y0, cy, out=edge)
+    inside &= np.less_equal(cy, y1, out=edge)
+    return np.where(inside.any(axis=1), inside.argmax(axis=1), -1).astype(np.int32)
+
+if njit is not None:
+    # Serial on purpose: a frame has tens of detections, too few to amortize a parallel launch
+    @njit(cache=True)
+    def _assign_zones_jit(cx, cy, x0, y0, x1, y1):
+        out = np.full(cx.size, -1, np.int32)
+        for i in range(cx.size):
+            for j in range(x0.size):
+                if x0[j] <= cx[i] <= x1[j] and y0[j] <= cy[i] <= y1[j]:
+                    out[i] = j
+                    break
+        return out
+
+def assign_zones(cx, cy, x0, y0, x1, y1) -> np.ndarray:
+    """Index of the first zone (corners x0, y0 to x1, y1; edges inclusive) containing each point, or -1"""
+    cx, cy, x0, y0, x1, y1 = _prepare(cx, cy, x0, y0, x1, y1)
+    if not x0.size:
+        return np.full(cx.size, -1, np.int32)
+    if njit is not None:
+        return _assign_zones_jit(cx, cy, x0, y0, x1, y1)
+    return _assign_zones_numpy(cx, cy, x0, y0, x1, y1)
+
+def warmup():
+    """Compile (or load the cached) kernel now instead of on the first detected frame"""
+    one = np.zeros(1)
+    assign_zones(one, one, one, one, one, one)